@@ -0,0 +1,242 @@
+r"""
+Cylinder decompositions of translation surfaces.
+
+In a completely periodic direction, a translation surface decomposes into
+cylinders bounded by saddle connections. The decomposition is read from the
+interval exchange transformation of the flow
+(:class:`~flatsurf.geometry.interval_exchange_transformation.FlowIET`): the
+orbits of the ends of its intervals cut the transversal into pieces that are
+permuted by the interval exchange, and each cycle of pieces is a cylinder.
+"""
+from bisect import bisect_left, bisect_right
+
+from flatsurf.geometry.polygon import wedge_product, dot_product
+from flatsurf.geometry.saddle_connection import SaddleConnection, canonical_corner
+
+class Cylinder(object):
+    r"""
+    A cylinder of a translation surface.
+
+    The cylinder is given by the direction of its core curves, the holonomy
+    of its core curves, the transverse measure of its cross section and its
+    two boundaries.
+
+    The transverse measure is the one of
+    :class:`~flatsurf.geometry.interval_exchange_transformation.FlowIET`,
+    that is the width of the cylinder multiplied by the norm of the
+    direction. Hence the area and the modulus of the cylinder are computed
+    in the base ring of the surface.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: t = translation_surfaces.square_torus()
+        sage: C, = t.cylinder_decomposition((1,2))
+        sage: C
+        Cylinder in direction (1, 2) with holonomy (1, 2) and area 1
+        sage: C.modulus()
+        1/5
+        sage: C.height() * C.circumference() == C.area()
+        True
+    """
+    def __init__(self, direction, holonomy, transverse_measure, left_boundary, right_boundary):
+        self._direction = direction
+        self._holonomy = holonomy
+        self._transverse_measure = transverse_measure
+        self._left_boundary = left_boundary
+        self._right_boundary = right_boundary
+
+    def __repr__(self):
+        return "Cylinder in direction {} with holonomy {} and area {}".format(
+                self._direction, self._holonomy, self.area())
+
+    def direction(self):
+        r"""
+        Return the direction of the cylinder.
+        """
+        return self._direction
+
+    def holonomy(self):
+        r"""
+        Return the holonomy vector of the core curves of the cylinder.
+        """
+        return self._holonomy
+
+    def circumference(self):
+        r"""
+        Return the length of the core curves of the cylinder.
+        """
+        return self._holonomy.norm()
+
+    def area(self):
+        r"""
+        Return the area of the cylinder.
+        """
+        d = self._direction
+        return self._transverse_measure * dot_product(self._holonomy, d) / dot_product(d, d)
+
+    def height(self):
+        r"""
+        Return the height of the cylinder, that is its size in the direction
+        perpendicular to its core curves.
+        """
+        return self.area() / self.circumference()
+
+    def modulus(self):
+        r"""
+        Return the modulus of the cylinder, that is its height divided by
+        its circumference.
+        """
+        return self.area() / dot_product(self._holonomy, self._holonomy)
+
+    def left_boundary(self):
+        r"""
+        Return the list of saddle connections that make the boundary of the
+        cylinder on the left of the flow.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: t = translation_surfaces.square_torus()
+            sage: C, = t.cylinder_decomposition((1,0))
+            sage: C.left_boundary()
+            [Saddle connection with holonomy (1, 0) from vertex 0 of polygon 0 to vertex 2 of polygon 0]
+            sage: C.right_boundary()
+            [Saddle connection with holonomy (1, 0) from vertex 0 of polygon 0 to vertex 2 of polygon 0]
+
+        The boundaries are saddle connections as found by
+        :meth:`~flatsurf.geometry.half_translation_surface.HalfTranslationSurface.saddle_connections`::
+
+            sage: O = translation_surfaces.regular_octagon()
+            sage: sc = set(O.saddle_connections(3))
+            sage: all(s in sc for C in O.cylinder_decomposition((1,0))
+            ....:     for s in C.left_boundary() + C.right_boundary())
+            True
+        """
+        return list(self._left_boundary)
+
+    def right_boundary(self):
+        r"""
+        Return the list of saddle connections that make the boundary of the
+        cylinder on the right of the flow.
+        """
+        return list(self._right_boundary)
+
+def _boundary(surface, holonomies, start_corners, end_corners):
+    r"""
+    Return the saddle connections along a boundary of a cylinder.
+
+    The boundary crosses the transversal at a cyclic sequence of points. The
+    ``i``-th step from one point to the next has holonomy ``holonomies[i]``.
+    ``start_corners[i]`` is the corner of the singularity at the ``i``-th
+    point (or ``None`` if this point is regular) and ``end_corners[i]`` is
+    the corner of the singularity where the ``i``-th step ends (if any).
+    """
+    m = len(holonomies)
+    saddle_connections = []
+    for i in xrange(m):
+        if start_corners[i] is None:
+            continue
+        holonomy = holonomies[i]
+        j = i
+        while start_corners[(j+1) % m] is None:
+            j = (j+1) % m
+            holonomy = holonomy + holonomies[j]
+        if holonomy.is_zero():
+            continue
+        label, v = start_corners[i]
+        end_label, end_v = end_corners[j]
+        saddle_connections.append(SaddleConnection(
+            canonical_corner(surface, label, v, holonomy), holonomy,
+            canonical_corner(surface, end_label, end_v, -holonomy)))
+    return saddle_connections
+
+def cylinder_decomposition(iet):
+    r"""
+    Return the list of cylinders of the surface of the interval exchange of
+    the flow ``iet``.
+
+    The direction of the flow must be completely periodic, otherwise this
+    function does not terminate (see
+    :meth:`~flatsurf.geometry.translation_surface.TranslationSurface.cylinder_decomposition`).
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.cylinder import cylinder_decomposition
+        sage: O = translation_surfaces.regular_octagon()
+        sage: cylinders = cylinder_decomposition(O.flow_iet((1,0)))
+        sage: len(cylinders)
+        2
+        sage: sum(C.area() for C in cylinders) == O.area()
+        True
+        sage: cylinders[0].modulus() == cylinders[1].modulus()
+        True
+    """
+    surface = iet.surface()
+    L = iet.length()
+    lengths = iet.lengths()
+    n = len(lengths)
+    starts = [iet.base_ring().zero()]
+    for l in lengths:
+        starts.append(starts[-1] + l)
+
+    # the vertices on the transversal: an edge starts at its first vertex
+    # and ends at its second vertex
+    vertex_starts = {}
+    vertex_ends = {}
+    x = starts[0]
+    for label, e in iet.transversal():
+        vertex_starts[x] = (label, e)
+        x += iet.flow_map(label).length_bot(e)
+        vertex_ends[x] = (label, (e+1) % surface.polygon(label).num_edges())
+
+    # cut the transversal with the orbits of the ends of the intervals
+    points = set()
+    for x in starts[:-1]:
+        while x not in points:
+            points.add(x)
+            x = iet(x)
+    points = sorted(points)
+    points.append(L)
+    index = {x:i for i,x in enumerate(points)}
+    m = len(points) - 1
+
+    def end_corner(x, left):
+        if left:
+            k = bisect_left(starts, x, 1, n) - 1
+        else:
+            k = bisect_right(starts, x, 1, n) - 1
+        label, j = iet.exit_edge(k)
+        if left:
+            return (label, j)
+        return (label, (j+1) % surface.polygon(label).num_edges())
+
+    cylinders = []
+    seen = [False] * m
+    for i in xrange(m):
+        if seen[i]:
+            continue
+        cycle = []
+        while not seen[i]:
+            seen[i] = True
+            cycle.append(i)
+            i = index[iet(points[i])]
+        lefts = [points[i] for i in cycle]
+        rights = [points[i+1] for i in cycle]
+
+        left_holonomies = [iet.segment_holonomy(x) for x in lefts]
+        right_holonomies = [iet.segment_holonomy(x, left=True) for x in rights]
+        holonomy = left_holonomies[0]
+        for v in left_holonomies[1:]:
+            holonomy = holonomy + v
+
+        left_boundary = _boundary(surface, left_holonomies,
+                [vertex_starts.get(x) for x in lefts],
+                [end_corner(x, False) for x in lefts])
+        right_boundary = _boundary(surface, right_holonomies,
+                [vertex_ends.get(x) for x in rights],
+                [end_corner(x, True) for x in rights])
+        cylinders.append(Cylinder(iet.direction(), holonomy,
+                rights[0] - lefts[0], left_boundary, right_boundary))
+    return cylinders
@@ -0,0 +1,155 @@
+r"""
+Teichmueller geodesic flow.
+
+The geodesic flow acts on a translation surface by the diagonal matrices
+``diag(e^t, e^{-t})``. To keep the polygons from degenerating, the surface
+is kept Delaunay triangulated: after each step of the flow, the edges which
+lost the Delaunay property are flipped. The sequence of flips is the
+combinatorial itinerary of the flow.
+"""
+from array import array
+
+class GeodesicFlow(object):
+    r"""
+    Apply the diagonal matrix ``diag(l, 1/l)`` step by step to a Delaunay
+    triangulation of a surface.
+
+    A single mutable triangulation is kept and the matrix is applied to its
+    triangles in place. After each step, only the edges which are not
+    Delaunay anymore are put in the worklist of
+    :meth:`~flatsurf.geometry.similarity_surface.SimilaritySurface.delaunay_flip_edges`.
+    The flips are recorded in a flat array (see :meth:`itinerary`).
+
+    INPUT:
+
+    - ``surface`` -- a finite half-translation surface
+
+    - ``l`` -- an element of the base ring of ``surface`` (the time of a
+      step is ``log(l)``)
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.geodesic_flow import GeodesicFlow
+        sage: O = translation_surfaces.regular_octagon()
+        sage: F = GeodesicFlow(O, 2)
+        sage: F.step(3)
+        sage: F.num_steps()
+        3
+        sage: s = F.surface()
+        sage: all(not s._edge_needs_flip(l,e) for l,e in s.edge_iterator())
+        True
+        sage: s.area() == O.area()
+        True
+
+    The result is the same as the Delaunay triangulation of the image of the
+    surface::
+
+        sage: s.systole().squared_length() == (matrix([[8,0],[0,1/8]]) * O).systole().squared_length()
+        True
+        sage: sum(len(flips) for flips in F.itinerary()) == F.num_flips()
+        True
+
+    The matrix is applied polygon by polygon, which is only compatible with
+    gluings by translations and half-turns::
+
+        sage: GeodesicFlow(similarity_surfaces.example(), 2)
+        Traceback (most recent call last):
+        ...
+        ValueError: the surface must be a half-translation surface
+    """
+    def __init__(self, surface, l):
+        from flatsurf.geometry.half_translation_surface import HalfTranslationSurface
+        if not isinstance(surface, HalfTranslationSurface):
+            raise ValueError("the surface must be a half-translation surface")
+        if not surface.is_finite():
+            raise ValueError("the surface must be built from finitely many polygons")
+        from sage.matrix.constructor import matrix
+        from flatsurf.geometry.polygon import Polygons
+        self._s = surface.delaunay_triangulation()
+        ring = self._s.base_ring()
+        l = ring(l)
+        self._m = matrix(ring, [[l, 0], [0, ~l]])
+        self._P = Polygons(ring)
+
+        self._labels = list(self._s.label_iterator())
+        self._index = {lab:i for i,lab in enumerate(self._labels)}
+        # the flips (label, edge) encoded as 3*index(label) + edge and the
+        # number of flips done at the end of each step
+        self._flips = array('l')
+        self._step_ends = array('l')
+
+    def __repr__(self):
+        return "Geodesic flow by {} on {!r}".format(self._m.diagonal(), self._s)
+
+    def surface(self):
+        r"""
+        Return the current Delaunay triangulated surface.
+
+        The surface is changed by :meth:`step` and must not be modified.
+        """
+        return self._s
+
+    def num_steps(self):
+        r"""
+        Return the number of steps of the flow performed so far.
+        """
+        return len(self._step_ends)
+
+    def num_flips(self):
+        r"""
+        Return the total number of flips performed so far.
+        """
+        return len(self._flips)
+
+    def _apply_matrix(self):
+        s = self._s
+        m = self._m
+        P = self._P
+        for lab in self._labels:
+            p = s.polygon(lab)
+            s.change_polygon(lab, P([m * p.edge(e) for e in xrange(3)]))
+
+    def step(self, n=1):
+        r"""
+        Perform ``n`` steps of the flow.
+        """
+        s = self._s
+        flips = self._flips
+        index = self._index
+        def record(lab, e):
+            flips.append(3*index[lab] + e)
+        for _ in xrange(n):
+            self._apply_matrix()
+            edges = [(lab,e) for lab,e in s.edge_iterator() if s._edge_needs_flip(lab,e)]
+            if edges:
+                s.delaunay_flip_edges(edges, record)
+            self._step_ends.append(len(flips))
+
+    def flips(self, i):
+        r"""
+        Return the list of the edges ``(label, edge)`` flipped during the
+        ``i``-th step.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: from flatsurf.geometry.geodesic_flow import GeodesicFlow
+            sage: F = GeodesicFlow(translation_surfaces.regular_octagon(), 2)
+            sage: F.step()
+            sage: len(F.flips(0)) == F.num_flips()
+            True
+            sage: all(0 <= e < 3 for l,e in F.flips(0))
+            True
+        """
+        if i < 0 or i >= len(self._step_ends):
+            raise ValueError("no step {}".format(i))
+        start = self._step_ends[i-1] if i else 0
+        labels = self._labels
+        return [(labels[k // 3], k % 3) for k in self._flips[start:self._step_ends[i]]]
+
+    def itinerary(self):
+        r"""
+        Return the list, for each step, of the list of flipped edges.
+        """
+        return [self.flips(i) for i in xrange(len(self._step_ends))]
@@ -28,6 +28,116 @@ class HalfTranslationSurface(HalfDilationSurface, RationalConeSurface):
                 tester.assertTrue(SimilaritySurface.edge_matrix(self,lab,e).is_one() or \
                     (-SimilaritySurface.edge_matrix(self,lab,e)).is_one() )
 
+    def saddle_connections(self, length_bound):
+        r"""
+        Return the list of saddle connections of length at most
+        ``length_bound`` sorted by length.
+
+        Each saddle connection appears once in each of its two orientations.
+        The enumeration is cached (until the surface is mutated) and resumed
+        from where it stopped when a larger bound is asked for (see
+        :class:`~flatsurf.geometry.saddle_connection.SaddleConnectionEnumerator`).
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: t = translation_surfaces.square_torus()
+            sage: t.saddle_connections(2)
+            [Saddle connection with holonomy (1, 0) from vertex 0 of polygon 0 to vertex 2 of polygon 0,
+             Saddle connection with holonomy (0, 1) from vertex 1 of polygon 0 to vertex 3 of polygon 0,
+             Saddle connection with holonomy (-1, 0) from vertex 2 of polygon 0 to vertex 0 of polygon 0,
+             Saddle connection with holonomy (0, -1) from vertex 3 of polygon 0 to vertex 1 of polygon 0,
+             Saddle connection with holonomy (1, 1) from vertex 0 of polygon 0 to vertex 2 of polygon 0,
+             Saddle connection with holonomy (-1, 1) from vertex 1 of polygon 0 to vertex 3 of polygon 0,
+             Saddle connection with holonomy (-1, -1) from vertex 2 of polygon 0 to vertex 0 of polygon 0,
+             Saddle connection with holonomy (1, -1) from vertex 3 of polygon 0 to vertex 1 of polygon 0]
+
+            sage: O = translation_surfaces.regular_octagon()
+            sage: sc = O.saddle_connections(3)
+            sage: len(set(sc)) == len(sc)
+            True
+            sage: O.saddle_connections(2) == [s for s in sc if s.squared_length() <= 4]
+            True
+        """
+        cache = self._s._cache
+        try:
+            enumerator = cache["saddle_connections"]
+        except KeyError:
+            from flatsurf.geometry.saddle_connection import SaddleConnectionEnumerator
+            enumerator = cache["saddle_connections"] = SaddleConnectionEnumerator(self)
+        return enumerator.saddle_connections(length_bound)
+
+    def systole(self):
+        r"""
+        Return a shortest saddle connection of this surface.
+
+        The disk whose diameter is a shortest saddle connection contains no
+        singularity in its interior, so that a shortest saddle connection is
+        an edge of any Delaunay triangulation. Hence only the edges of
+        :meth:`delaunay_triangulation` are compared, which is much faster than
+        :meth:`saddle_connections`. The ends of the shortest edge are then
+        pulled back to the polygons of this surface through
+        :func:`~flatsurf.geometry.mappings.delaunay_triangulation_mapping`.
+
+        The result is cached until the surface is mutated.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: O = translation_surfaces.regular_octagon()
+            sage: sc = O.systole()
+            sage: sc.squared_length()
+            1
+            sage: sc.squared_length() == O.saddle_connections(2)[0].squared_length()
+            True
+
+            sage: t = translation_surfaces.square_torus()
+            sage: s = matrix([[2,1],[0,1/2]]) * t
+            sage: sc = s.systole()
+            sage: sc.squared_length()
+            1
+            sage: sc.holonomy()[0]
+            0
+
+        The saddle connection is one of :meth:`saddle_connections`::
+
+            sage: s0 = translation_surfaces.octagon_and_squares()
+            sage: a = s0.base_ring().gens()[0]
+            sage: s = Matrix([[1,2+a],[0,1]]) * s0
+            sage: sc = s.systole()
+            sage: sc in s.saddle_connections(sc.squared_length() + 1)
+            True
+        """
+        cache = self._s._cache
+        try:
+            return cache["systole"]
+        except KeyError:
+            pass
+        from flatsurf.geometry.polygon import dot_product
+        from flatsurf.geometry.saddle_connection import SaddleConnection
+        from flatsurf.geometry.mappings import delaunay_triangulation_mapping
+        m = delaunay_triangulation_mapping(self)
+        s = self if m is None else m.codomain()
+        best = None
+        for lab, p in s.label_polygon_iterator():
+            for e in xrange(3):
+                v = p.vertex(e+1) - p.vertex(e)
+                l = dot_product(v, v)
+                if best is None or l < best[0]:
+                    best = (l, lab, e, v)
+        l, lab, e, v = best
+        p = s.polygon(lab)
+        start = s.tangent_vector(lab, p.vertex(e), v)
+        end = s.tangent_vector(lab, p.vertex(e+1), -v)
+        if m is not None:
+            start = m.pull_vector_back(start)
+            end = m.pull_vector_back(end)
+        sc = cache["systole"] = SaddleConnection(
+                (start.polygon_label(), start.position().get_vertex()),
+                start.vector(),
+                (end.polygon_label(), end.position().get_vertex()))
+        return sc
+
     
 # This was all implemented in HalfDilationSurface now.
 #    
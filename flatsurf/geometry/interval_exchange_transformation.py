@@ -1,4 +1,9 @@
+import math
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+
 from sage.structure.sage_object import SageObject
+from sage.modules.free_module_element import vector
 
 class FlowPolygonMap(SageObject):
     r"""
@@ -59,45 +64,21 @@ class FlowPolygonMap(SageObject):
         if len(self._top_labels) != len(self._top_labels_to_index):
             raise ValueError("non unique labels in top: {}".format(top_labels))
 
-        self._bot_lengths = map(ring,bot_lengths)
-        self._top_lengths = map(ring,top_lengths)
-
-
-        # forward image of intervals
-        it = 0
-        lt = x1 = top_lengths[it]
-        self._forward_images = []
-        for ib in range(len(bot_lengths)):
-            lenb = bot_lengths[ib]
-            self._forward_images.append((it,lt-x1))
-
-            while lenb and lenb >= x1:
-                lenb -= x1
-                it += 1
-                if it < len(top_lengths):
-                    lt = x1 = top_lengths[it]
-                else:
-                    lt = ring.zero()
-            if lenb:
-                x1 -= lenb
-
-        # backward image of intervals
-        ib = 0
-        lb = x1 = bot_lengths[ib]
-        self._backward_images = []
-        for it in range(len(top_lengths)):
-            lent = top_lengths[it]
-            self._backward_images.append((ib,lb-x1))
-
-            while lent and lent >= x1:
-                lent -= x1
-                ib += 1
-                if ib < len(bot_lengths):
-                    lb = x1 = bot_lengths[ib]
-                else:
-                    lb = ring.zero()
-            if lent:
-                x1 -= lent
+        self._bot_lengths = [ring(x) for x in bot_lengths]
+        self._top_lengths = [ring(x) for x in top_lengths]
+
+        # positions of the left endpoints of the intervals (together with the
+        # total length as last element)
+        self._bot_starts = self._partial_sums(self._bot_lengths)
+        self._top_starts = self._partial_sums(self._top_lengths)
+
+    def _partial_sums(self, lengths):
+        x = self._ring.zero()
+        starts = [x]
+        for l in lengths:
+            x += l
+            starts.append(x)
+        return starts
 
     def length_bot(self, i):
         i = self._bot_labels_to_index[i]
@@ -132,17 +113,70 @@ class FlowPolygonMap(SageObject):
             (3, 0)
         """
         i = self._bot_labels_to_index[i]
-        if x < self._ring.zero() or x > self._bot_lengths[i]:
+        if x < 0 or x > self._bot_lengths[i]:
             raise ValueError("x = {} is out of the interval".format(x))
-        j,y = self._forward_images[i]
-        if x+y < self._top_lengths[j]:
-            return (self._top_labels[j], x+y)
-        x -= self._top_lengths[j]-y
-        j += 1
-        while x > self._top_lengths[j]:
-            x -= self._top_lengths[j]
-            j += 1
-        return (self._top_labels[j],x)
+        x += self._bot_starts[i]
+        j = bisect_right(self._top_starts, x, 1, len(self._top_labels)) - 1
+        return (self._top_labels[j], x - self._top_starts[j])
+
+    def forward_images(self, i, xs):
+        r"""
+        Return the list of forward images of the points ``(i, x)`` for ``x`` in
+        ``xs``.
+
+        EXAMPLES::
+
+            sage: from flatsurf.geometry.interval_exchange_transformation import FlowPolygonMap
+            sage: T = FlowPolygonMap(QQ, [0,1,2], [2,3,1], [2,1,0], [1,3,2])
+            sage: T.forward_images(1, [0,1,2,3])
+            [(1, 1), (1, 2), (0, 0), (0, 1)]
+            sage: T.forward_images(1, [3,0,5/2]) == [T.forward_image(1,x) for x in [3,0,5/2]]
+            True
+        """
+        return self._images(self._bot_labels_to_index[i], xs,
+                self._bot_lengths, self._bot_starts,
+                self._top_labels, self._top_starts)
+
+    def backward_images(self, i, xs):
+        r"""
+        Return the list of backward images of the points ``(i, x)`` for ``x``
+        in ``xs``.
+
+        EXAMPLES::
+
+            sage: from flatsurf.geometry.interval_exchange_transformation import FlowPolygonMap
+            sage: T = FlowPolygonMap(QQ, [0,1,2], [2,3,1], [2,1,0], [1,3,2])
+            sage: T.backward_images(0, [0,1])
+            [(1, 2), (2, 0)]
+            sage: T.backward_images(1, [0,1,2])
+            [(0, 1), (1, 0), (1, 1)]
+        """
+        return self._images(self._top_labels_to_index[i], xs,
+                self._top_lengths, self._top_starts,
+                self._bot_labels, self._bot_starts)
+
+    def _images(self, i, xs, lengths, starts, labels, image_starts):
+        r"""
+        Common implementation of :meth:`forward_images` and
+        :meth:`backward_images`.
+
+        The points are sorted first so that the atoms of the image can be
+        found in a single pass.
+        """
+        l = lengths[i]
+        s = starts[i]
+        n = len(labels)
+        res = [None] * len(xs)
+        j = 0
+        for k in sorted(xrange(len(xs)), key=xs.__getitem__):
+            x = xs[k]
+            if x < 0 or x > l:
+                raise ValueError("x = {} is out of the interval".format(x))
+            x += s
+            while j < n-1 and image_starts[j+1] <= x:
+                j += 1
+            res[k] = (labels[j], x - image_starts[j])
+        return res
 
     def backward_image(self, i, x):
         r"""
@@ -186,14 +220,727 @@ class FlowPolygonMap(SageObject):
 
         """
         i = self._top_labels_to_index[i]
-        if x < self._ring.zero() or x > self._top_lengths[i]:
+        if x < 0 or x > self._top_lengths[i]:
+            raise ValueError("x = {} is out of the interval".format(x))
+        x += self._top_starts[i]
+        j = bisect_right(self._bot_starts, x, 1, len(self._bot_labels)) - 1
+        return (self._bot_labels[j], x - self._bot_starts[j])
+
+class FlowIET(SageObject):
+    r"""
+    The interval exchange transformation induced by the straight-line flow
+    in a fixed direction on a translation surface.
+
+    The transversal is the union of the edges through which the flow enters
+    the polygons. Each of these edges is seen as an interval whose length is
+    its transverse measure and the intervals are placed one after the other
+    (in the order given by :meth:`transversal`). A point of the transversal is
+    then either given by its position in ``[0, length)`` or by a triple
+    ``(label, edge, x)`` as in
+    :class:`~flatsurf.geometry.straight_line_trajectory.StraightLineTrajectoryTranslation`.
+
+    The first return map on the transversal is stored as arrays of starting
+    points and translations of its intervals. Applying it to a point costs a
+    bisection and an addition. Since building it requires to look at each
+    polygon once, it should be obtained with
+    :meth:`~flatsurf.geometry.translation_surface.TranslationSurface.flow_iet`
+    which caches it on the surface.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+        sage: T
+        Interval exchange transformation of the flow in direction (1, 2)
+        sage: T.transversal()
+        [(0, 3), (0, 0)]
+        sage: T.length()
+        3
+        sage: T.lengths()
+        [1, 1, 1]
+        sage: T.permutation()
+        [1, 2, 0]
+        sage: [T(x) for x in [0, 1/2, 1, 5/2]]
+        [1, 3/2, 2, 1/2]
+        sage: [T.preimage(T(x)) for x in [0, 1/2, 1, 5/2]]
+        [0, 1/2, 1, 5/2]
+    """
+    def __init__(self, surface, direction, flow_maps=None):
+        r"""
+        INPUT:
+
+        - ``surface`` -- a finite translation surface
+
+        - ``direction`` -- a non-zero vector
+
+        - ``flow_maps`` -- an optional dictionary ``label -> FlowPolygonMap``
+          of flow maps in ``direction`` that were already computed. The
+          missing ones are added to it.
+        """
+        if not surface.is_finite():
+            raise ValueError("the surface must be built from finitely many polygons")
+
+        self._surface = surface
+        self._direction = direction = vector(direction)
+
+        from sage.structure.element import get_coercion_model
+        self._ring = ring = get_coercion_model().common_parent(surface.base_ring(), direction.base_ring())
+
+        # flow maps of the polygons and the edges of the transversal
+        if flow_maps is None:
+            flow_maps = {}
+        self._flow_maps = flow_maps
+        self._edges = []
+        for lab in surface.label_iterator():
+            try:
+                fm = flow_maps[lab]
+            except KeyError:
+                fm = flow_maps[lab] = surface.polygon(lab).flow_map(direction)
+            for e in fm._bot_labels:
+                self._edges.append((lab,e))
+        self._edge_index = {j:i for i,j in enumerate(self._edges)}
+        self._edge_starts = starts = [ring.zero()]
+        for lab,e in self._edges:
+            starts.append(starts[-1] + self._flow_maps[lab].length_bot(e))
+
+        # the intervals of the first return map are the bottom edges
+        # subdivided by the top vertices
+        self._starts = []
+        self._lengths = []
+        self._shifts = []
+        self._exits = []
+        for k,(lab,e) in enumerate(self._edges):
+            fm = self._flow_maps[lab]
+            i = fm._bot_labels_to_index[e]
+            a = fm._bot_starts[i]
+            b = fm._bot_starts[i+1]
+            top_starts = fm._top_starts
+            j = bisect_right(top_starts, a, 1, len(fm._top_labels)) - 1
+            x = a
+            while x < b:
+                y = min(b, top_starts[j+1])
+                lab2, e2 = surface.opposite_edge(lab, fm._top_labels[j])
+                src = starts[k] + (x - a)
+                dst = starts[self._edge_index[(lab2,e2)]] + (x - top_starts[j])
+                self._starts.append(src)
+                self._lengths.append(y - x)
+                self._shifts.append(dst - src)
+                self._exits.append((lab, fm._top_labels[j]))
+                x = y
+                j += 1
+        n = len(self._starts)
+        self._starts.append(starts[-1])
+
+        # order of the images
+        order = sorted(xrange(n), key=lambda k: self._starts[k] + self._shifts[k])
+        self._permutation = [None] * n
+        for r,k in enumerate(order):
+            self._permutation[k] = r
+        self._image_starts = [self._starts[k] + self._shifts[k] for k in order]
+        self._image_starts.append(starts[-1])
+        self._image_shifts = [-self._shifts[k] for k in order]
+
+        self._float_arrays = None
+
+    def _repr_(self):
+        return "Interval exchange transformation of the flow in direction {}".format(self._direction)
+
+    def surface(self):
+        r"""
+        Return the translation surface.
+        """
+        return self._surface
+
+    def direction(self):
+        r"""
+        Return the direction of the flow.
+        """
+        return self._direction
+
+    def base_ring(self):
+        r"""
+        Return the ring in which the lengths are computed.
+        """
+        return self._ring
+
+    def transversal(self):
+        r"""
+        Return the list of pairs ``(label, edge)`` of the edges that make the
+        transversal in their order along it.
+        """
+        return list(self._edges)
+
+    def length(self):
+        r"""
+        Return the total length of the transversal.
+        """
+        return self._starts[-1]
+
+    def num_intervals(self):
+        r"""
+        Return the number of intervals that are exchanged.
+        """
+        return len(self._lengths)
+
+    def lengths(self):
+        r"""
+        Return the list of lengths of the exchanged intervals.
+        """
+        return list(self._lengths)
+
+    def permutation(self):
+        r"""
+        Return the permutation of the exchanged intervals.
+
+        The ``k``-th interval is mapped to the position ``permutation()[k]``
+        in the image.
+        """
+        return list(self._permutation)
+
+    def flow_map(self, label):
+        r"""
+        Return the :class:`FlowPolygonMap` of the polygon with the given label.
+        """
+        return self._flow_maps[label]
+
+    def exit_edge(self, k):
+        r"""
+        Return the pair ``(label, edge)`` of the edge through which the points
+        of the ``k``-th interval leave their polygon.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+            sage: [T.exit_edge(k) for k in range(T.num_intervals())]
+            [(0, 2), (0, 2), (0, 1)]
+        """
+        return self._exits[k]
+
+    def float_arrays(self):
+        r"""
+        Return the starts and the translations of the intervals converted to
+        floating point numbers.
+
+        The starts list has one more element, the total length. This is used
+        for fast approximate iteration.
+        """
+        if self._float_arrays is None:
+            self._float_arrays = ([float(x) for x in self._starts],
+                                  [float(x) for x in self._shifts])
+        return self._float_arrays
+
+    def position(self, label, edge, x):
+        r"""
+        Return the position on the transversal of the point ``x`` in the edge
+        ``edge`` of the polygon ``label``.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+            sage: T.position(0, 0, 1/3)
+            4/3
+            sage: T.edge_point(4/3)
+            (0, 0, 1/3)
+        """
+        return self._edge_starts[self._edge_index[(label,edge)]] + x
+
+    def edge_point(self, x):
+        r"""
+        Return the triple ``(label, edge, y)`` corresponding to the position
+        ``x`` on the transversal.
+        """
+        if x < 0 or x >= self._starts[-1]:
+            raise ValueError("x = {} is out of the interval".format(x))
+        k = bisect_right(self._edge_starts, x, 1, len(self._edges)) - 1
+        lab, e = self._edges[k]
+        return (lab, e, x - self._edge_starts[k])
+
+    def segment_holonomy(self, x, left=False):
+        r"""
+        Return the holonomy of the segment of trajectory from the position
+        ``x`` on the transversal to its next crossing of the transversal.
+
+        If ``left`` is ``True``, the trajectory is the limit of the
+        trajectories of the points on the left of ``x`` (this makes sense for
+        ``x = length()`` as well). Otherwise it is the limit from the right,
+        as for :meth:`__call__`.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+            sage: T.segment_holonomy(1/2)
+            (1/4, 1/2)
+            sage: T.segment_holonomy(1), T.segment_holonomy(1, left=True)
+            ((1/2, 1), (1/2, 1))
+            sage: T.segment_holonomy(0), T.segment_holonomy(3, left=True)
+            ((0, 0), (0, 0))
+            sage: sum(T.segment_holonomy(x) for x in [0, 1, 2])
+            (1, 2)
+        """
+        n = len(self._shifts)
+        if left:
+            if x <= 0 or x > self._starts[-1]:
+                raise ValueError("x = {} is out of the interval".format(x))
+            k = bisect_left(self._starts, x, 1, n) - 1
+        else:
+            if x < 0 or x >= self._starts[-1]:
+                raise ValueError("x = {} is out of the interval".format(x))
+            k = bisect_right(self._starts, x, 1, n) - 1
+        i = bisect_right(self._edge_starts, self._starts[k], 1, len(self._edges)) - 1
+        lab, e = self._edges[i]
+        lab, j = self._exits[k]
+        lab2, e2 = self._surface.opposite_edge(lab, j)
+        i2 = self._edge_index[(lab2,e2)]
+        p = self._surface.polygon(lab)
+        q = self._surface.polygon(lab2)
+        y = (x - self._edge_starts[i]) / (self._edge_starts[i+1] - self._edge_starts[i])
+        y2 = (x + self._shifts[k] - self._edge_starts[i2]) / (self._edge_starts[i2+1] - self._edge_starts[i2])
+        return p.vertex(j+1) + y2 * q.edge(e2) - p.vertex(e) - y * p.edge(e)
+
+    def __call__(self, x):
+        r"""
+        Return the image of the position ``x`` under the first return map.
+        """
+        if x < 0 or x >= self._starts[-1]:
+            raise ValueError("x = {} is out of the interval".format(x))
+        return x + self._shifts[bisect_right(self._starts, x, 1, len(self._shifts)) - 1]
+
+    def preimage(self, x):
+        r"""
+        Return the preimage of the position ``x`` under the first return map.
+        """
+        if x < 0 or x >= self._starts[-1]:
+            raise ValueError("x = {} is out of the interval".format(x))
+        return x + self._image_shifts[bisect_right(self._image_starts, x, 1, len(self._image_shifts)) - 1]
+
+    def edge_coordinates(self, label, point):
+        r"""
+        Return the triple ``(label, edge, x)`` where the trajectory through
+        ``point`` in the polygon ``label`` enters its polygon.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+            sage: T.edge_coordinates(0, (1/2,1/2))
+            (0, 0, 1/2)
+        """
+        from flatsurf.geometry.straight_line_trajectory import SegmentInPolygon, get_linearity_coeff
+        v = self._surface.tangent_vector(label, point, self._direction)
+        start = SegmentInPolygon(v).start()
+        pos = start.position()
+        if pos.is_vertex():
+            e = pos.get_vertex()
+        else:
+            e = pos.get_edge()
+        label = start.polygon_label()
+        poly = self._surface.polygon(label)
+        x = get_linearity_coeff(poly.edge(e), start.point() - poly.vertex(e))
+        return (label, e, x * self._flow_maps[label].length_bot(e))
+
+    def flow_many(self, points, steps, alphabet=None):
+        r"""
+        Flow all the ``points`` forward for ``steps`` steps.
+
+        The points are triples ``(label, edge, x)`` (see
+        :meth:`edge_coordinates`). At each step, the points sitting on a
+        same edge are moved together through the flow map of their polygon. A
+        point stops as soon as it reaches a singularity.
+
+        Return a pair of lists: the final points and the codings, that is the
+        lists of edges ``(label, edge)`` through which each point left its
+        polygons. If ``alphabet`` (a dictionary ``(label, edge) -> letter``)
+        is provided, the edges are replaced by letters and the edges not in
+        the alphabet are ignored.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+            sage: ends, codings = T.flow_many([(0,0,1/4), (0,3,1/2), (0,0,1)], 3)
+            sage: ends
+            [(0, 0, 1/4), (0, 3, 1/2), (0, 3, 0)]
+            sage: codings
+            [[(0, 2), (0, 1), (0, 2)], [(0, 2), (0, 2), (0, 1)], [(0, 1)]]
+            sage: T.flow_many([(0,0,1/4)], 3, alphabet={(0,0):'a', (0,1):'b', (0,2):'a', (0,3):'b'})
+            ([(0, 0, 1/4)], [['a', 'b', 'a']])
+        """
+        points = list(points)
+        codings = [[] for _ in points]
+        active = range(len(points))
+        opposite = {}
+        for i in xrange(steps):
+            if not active:
+                break
+            groups = defaultdict(list)
+            for k in active:
+                lab, e, x = points[k]
+                groups[lab,e].append(k)
+            active = []
+            for (lab,e),ks in groups.iteritems():
+                images = self._flow_maps[lab].forward_images(e, [points[k][2] for k in ks])
+                for k,(e2,x) in zip(ks,images):
+                    try:
+                        lab2,e3 = opposite[lab,e2]
+                    except KeyError:
+                        lab2,e3 = opposite[lab,e2] = self._surface.opposite_edge(lab,e2)
+                    points[k] = (lab2,e3,x)
+                    letter = (lab,e2) if alphabet is None else alphabet.get((lab,e2))
+                    if letter is not None:
+                        codings[k].append(letter)
+                    if x:
+                        active.append(k)
+        return points, codings
+
+    def rauzy_induction(self, floating=False):
+        r"""
+        Return a :class:`RauzyInduction` started at this interval exchange.
+
+        If ``floating`` is ``True`` the induction is performed with floating
+        point numbers, which is much faster but not reliable to detect
+        connections.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+            sage: R = T.rauzy_induction()
+            sage: R.run()
+            True
+            sage: R.cylinders()
+            [(0, 1, 3)]
+        """
+        return RauzyInduction(self, floating)
+
+    def forward_image(self, label, edge, x):
+        r"""
+        Return the image of the point ``x`` of the edge ``edge`` of the polygon
+        ``label`` as a triple ``(label, edge, x)``.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: T = translation_surfaces.square_torus().flow_iet((1,2))
+            sage: T.forward_image(0, 0, 3/2)
+            (0, 3, 1/2)
+            sage: T.backward_image(0, 3, 1/2)
+            (0, 0, 3/2)
+        """
+        e, x = self._flow_maps[label].forward_image(edge, x)
+        label, e = self._surface.opposite_edge(label, e)
+        return (label, e, x)
+
+    def backward_image(self, label, edge, x):
+        r"""
+        Return the preimage of the point ``x`` of the edge ``edge`` of the
+        polygon ``label`` as a triple ``(label, edge, x)``.
+        """
+        label, e = self._surface.opposite_edge(label, edge)
+        e, x = self._flow_maps[label].backward_image(e, x)
+        return (label, e, x)
+
+
+class RauzyInduction(SageObject):
+    r"""
+    Rauzy-Veech induction (with Zorich acceleration) of a :class:`FlowIET`.
+
+    At each step, the interval exchange is induced on a shorter interval
+    ``[0, length)`` of the transversal. Each interval of the induced map
+    remembers its translation and its return time, i.e. the number of steps
+    of the original interval exchange it corresponds to.
+
+    When the last interval on top and on bottom coincide, it is invariant by
+    the induced map: it is the transversal of a cylinder and it is removed
+    (see :meth:`cylinders`). When the last intervals on top and on bottom
+    have the same length, there is a saddle connection and the two intervals
+    are merged. In particular, the induction terminates if and only if the
+    direction is completely periodic. In a minimal direction, the length of
+    the interval goes to zero.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: x = polygen(QQ)
+        sage: K.<sqrt2> = NumberField(x^2 - 2, embedding=AA(2).sqrt())
+        sage: S = translation_surfaces.square_torus()
+        sage: T = S.flow_iet((1,sqrt2))
+        sage: R = T.rauzy_induction()
+        sage: R.run(50)
+        False
+        sage: R.num_steps() >= 50
+        True
+        sage: R.length() < 10^-6
+        True
+
+    Jumping forward along an orbit::
+
+        sage: x = 1/3
+        sage: y = x
+        sage: for i in range(500):
+        ....:     y = T(y)
+        sage: R.iterate(x, 500) == y
+        True
+        sage: F = T.rauzy_induction(floating=True)
+        sage: F.run(10)
+        False
+        sage: abs(F.iterate(float(x), 500) - float(y)) < 10^-6
+        True
+
+    In a periodic direction a huge number of steps costs nothing::
+
+        sage: T = S.flow_iet((1,2))
+        sage: R = T.rauzy_induction()
+        sage: R.run()
+        True
+        sage: R.iterate(1/2, 10^9)
+        3/2
+    """
+    def __init__(self, iet, floating=False):
+        self._iet = iet
+        self._floating = floating
+        if floating:
+            convert = float
+        else:
+            convert = lambda x: x
+
+        n = iet.num_intervals()
+        self._base_starts = [convert(x) for x in iet._starts]
+        self._base_shifts = [convert(x) for x in iet._shifts]
+        self._lengths = [convert(x) for x in iet._lengths]
+        self._shifts = list(self._base_shifts)
+        self._return_times = [1] * n
+        self._length = convert(iet.length())
+        if floating:
+            self._epsilon = 2.0**-40 * self._length
+
+        # labels of the intervals in the order of the domain and of the image
+        self._top = list(xrange(n))
+        self._bot = sorted(xrange(n), key=iet._permutation.__getitem__)
+
+        self._cylinders = []
+        self._num_steps = 0
+        self._domain_starts = None
+
+    def _repr_(self):
+        return "Rauzy induction of {!r}".format(self._iet)
+
+    def _equal(self, x, y):
+        if self._floating:
+            return abs(x-y) <= self._epsilon
+        return x == y
+
+    def _floor(self, x):
+        if self._floating:
+            return int(math.floor(x))
+        return x.floor()
+
+    def length(self):
+        r"""
+        Return the length of the interval on which the map is currently
+        induced.
+        """
+        return self._length
+
+    def num_intervals(self):
+        r"""
+        Return the number of intervals of the induced map.
+        """
+        return len(self._top)
+
+    def num_steps(self):
+        r"""
+        Return the number of Rauzy steps performed so far (the accelerated
+        steps count for as many Rauzy steps as they perform).
+        """
+        return self._num_steps
+
+    def lengths(self):
+        r"""
+        Return the lengths of the intervals of the induced map, in the order
+        of the domain.
+        """
+        return [self._lengths[i] for i in self._top]
+
+    def return_times(self):
+        r"""
+        Return the return times of the intervals of the induced map, in the
+        order of the domain.
+        """
+        return [self._return_times[i] for i in self._top]
+
+    def permutation(self):
+        r"""
+        Return the permutation of the induced map.
+
+        The ``k``-th interval of the domain is mapped to the position
+        ``permutation()[k]`` in the image.
+        """
+        rank = {j:i for i,j in enumerate(self._bot)}
+        return [rank[i] for i in self._top]
+
+    def cylinders(self):
+        r"""
+        Return the list of cylinders found so far.
+
+        Each cylinder is given as a triple ``(start, length, return_time)``
+        where ``[start, start+length)`` is an interval of the transversal that
+        is fixed by the ``return_time``-th iterate of the interval exchange.
+        """
+        return list(self._cylinders)
+
+    def is_finished(self):
+        r"""
+        Return whether the induction has terminated, that is whether the
+        direction was found to be completely periodic.
+        """
+        return not self._top
+
+    def step(self):
+        r"""
+        Perform one step of Rauzy induction.
+        """
+        top = self._top
+        bot = self._bot
+        if not top:
+            raise ValueError("the induction is finished")
+        lengths = self._lengths
+        shifts = self._shifts
+        times = self._return_times
+
+        a = top[-1]
+        b = bot[-1]
+        la = lengths[a]
+        lb = lengths[b]
+        if a == b:
+            # the last interval is invariant: a cylinder
+            self._length -= la
+            self._cylinders.append((self._length, la, times[a]))
+            top.pop()
+            bot.pop()
+        elif self._equal(la, lb):
+            # saddle connection: b goes through a and a disappears
+            shifts[b] += shifts[a]
+            times[b] += times[a]
+            top.pop()
+            bot.pop()
+            bot[bot.index(a)] = b
+            self._length -= la
+        elif la > lb:
+            # top wins: b goes through a
+            shifts[b] += shifts[a]
+            times[b] += times[a]
+            lengths[a] = la - lb
+            bot.pop()
+            bot.insert(bot.index(a)+1, b)
+            self._length -= lb
+        else:
+            # bottom wins: the end of b goes through a
+            shifts[a] += shifts[b]
+            times[a] += times[b]
+            lengths[b] = lb - la
+            top.pop()
+            top.insert(top.index(b)+1, a)
+            self._length -= la
+        self._num_steps += 1
+        self._domain_starts = None
+
+    def zorich_step(self):
+        r"""
+        Perform all the consecutive Rauzy steps that have the same winner.
+
+        The full cycles of losers are performed at once with a division so
+        that the cost does not depend on the number of Rauzy steps.
+        """
+        top = self._top
+        bot = self._bot
+        if not top:
+            raise ValueError("the induction is finished")
+        lengths = self._lengths
+        a = top[-1]
+        b = bot[-1]
+        if a != b and not self._equal(lengths[a], lengths[b]):
+            if lengths[a] > lengths[b]:
+                winner = a
+                losers = bot[bot.index(a)+1:]
+            else:
+                winner = b
+                losers = top[top.index(b)+1:]
+            lw = lengths[winner]
+            s = sum(lengths[i] for i in losers)
+            q = self._floor(lw / s)
+            if q > 0 and self._equal(q * s, lw):
+                q -= 1
+            if q > 0:
+                # after a full cycle the permutation is the same
+                lengths[winner] = lw - q * s
+                shift = self._shifts[winner]
+                time = self._return_times[winner]
+                for i in losers:
+                    self._shifts[i] += q * shift
+                    self._return_times[i] += q * time
+                self._length -= q * s
+                self._num_steps += q * len(losers)
+                self._domain_starts = None
+        self.step()
+
+    def run(self, max_steps=1000, min_length=None, zorich=True):
+        r"""
+        Run the induction until it terminates, or ``max_steps`` (accelerated
+        if ``zorich`` is ``True``) steps were performed, or the length of the
+        interval gets smaller than ``min_length``.
+
+        Return whether the induction terminated, that is whether the direction
+        is completely periodic.
+        """
+        step = self.zorich_step if zorich else self.step
+        i = 0
+        while self._top and (max_steps is None or i < max_steps) and \
+              (min_length is None or self._length >= min_length):
+            step()
+            i += 1
+        return not self._top
+
+    def iterate(self, x, n):
+        r"""
+        Return the image of the point ``x`` of the transversal under the
+        ``n``-th iterate of the interval exchange.
+
+        The induced map is used whenever possible so that this is much faster
+        than ``n`` applications of the interval exchange after the induction
+        went deep enough.
+        """
+        if x < 0 or x >= self._base_starts[-1]:
             raise ValueError("x = {} is out of the interval".format(x))
-        j,y = self._backward_images[i]
-        if x+y < self._bot_lengths[j]:
-            return (self._bot_labels[j], x+y)
-        x -= self._bot_lengths[j]-y
-        j += 1
-        while x > self._bot_lengths[j]:
-            x -= self._bot_lengths[j]
-            j += 1
-        return (self._bot_labels[j],x)
+        if self._domain_starts is None:
+            starts = [self._base_starts[0]]
+            for i in self._top:
+                starts.append(starts[-1] + self._lengths[i])
+            self._domain_starts = starts
+        starts = self._domain_starts
+        top = self._top
+        shifts = self._shifts
+        times = self._return_times
+        base_starts = self._base_starts
+        base_shifts = self._base_shifts
+        m = len(base_shifts)
+        while n > 0:
+            if x < self._length:
+                k = bisect_right(starts, x, 1, len(top)) - 1
+                i = top[k]
+                if times[i] <= n:
+                    x += shifts[i]
+                    n -= times[i]
+                    continue
+            else:
+                for start, length, time in self._cylinders:
+                    if start <= x < start + length:
+                        n %= time
+                        break
+                if n == 0:
+                    break
+            x += base_shifts[bisect_right(base_starts, x, 1, m) - 1]
+            n -= 1
+        return x
@@ -7,6 +7,7 @@ from flatsurf.geometry.translation import TranslationGroup
 
 from sage.rings.infinity import Infinity
 from sage.structure.sage_object import SageObject
+from sage.modules.free_module_element import vector
 
 class SurfaceMapping:
     r"""Abstract class for any mapping between surfaces."""
@@ -580,6 +581,120 @@ def subdivide_a_polygon(s):
     return None
 
 
+class TriangulationMapping(SurfaceMapping):
+    r"""
+    Mapping cutting every polygon of a finite surface into triangles.
+
+    Each polygon is cut in one pass (see
+    :meth:`~flatsurf.geometry.polygon.ConvexPolygon.triangulation`). The last
+    triangle cut from a polygon keeps the label of the polygon, the other
+    triangles get new labels. Polygons which are already triangles are left
+    untouched.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.mappings import TriangulationMapping
+        sage: s = translation_surfaces.regular_octagon()
+        sage: m = TriangulationMapping(s)
+        sage: m.codomain().num_polygons()
+        6
+        sage: TestSuite(m.codomain()).run()
+        sage: v = s.tangent_vector(0, (1/2,1/2), (1,1/3))
+        sage: w = m.push_vector_forward(v)
+        sage: m.pull_vector_back(w) == v
+        True
+        sage: v = s.tangent_vector(0, (0,0), (1,1))
+        sage: m.pull_vector_back(m.push_vector_forward(v)) == v
+        True
+    """
+    def __init__(self, s):
+        if not s.is_finite():
+            raise NotImplementedError("Only implemented for finite surfaces.")
+        P=Polygons(s.base_ring())
+        triangles={} # label -> list of triples (new label, triangle, translation)
+        sources={} # new label -> (label, translation)
+        position={} # (label, edge) -> (new label, new edge)
+        polygon_dictionary={}
+        glue_dictionary={}
+        for l,poly in s.label_iterator(polygons=True):
+            n=poly.num_edges()
+            if n==3:
+                continue
+            tt=poly.triangulation()
+            labels=[ExtraLabel() for i in xrange(len(tt)-1)]
+            labels.append(l)
+            sides={}
+            pieces=[]
+            for lab,t in zip(labels,tt):
+                v0,v1,v2=[poly.vertex(i) for i in t]
+                triangle=P(edges=[v1-v0,v2-v1,v0-v2])
+                polygon_dictionary[lab]=triangle
+                sources[lab]=(l,v0)
+                pieces.append((lab,triangle,v0))
+                for k in xrange(3):
+                    sides[(t[k],t[(k+1)%3])]=(lab,k)
+            for (a,b),edge in sides.iteritems():
+                if b==(a+1)%n:
+                    position[(l,a)]=edge
+                else:
+                    glue_dictionary[edge]=sides[(b,a)]
+            triangles[l]=pieces
+        for (l,e),edge in position.iteritems():
+            ll,ee=s.opposite_edge(l,e)
+            glue_dictionary[edge]=position.get((ll,ee),(ll,ee))
+
+        s2 = s.__class__(FinitelyPerturbedSurface(
+            s,
+            polygon_dictionary=polygon_dictionary,
+            glue_dictionary=glue_dictionary,
+            base_label=s.base_label(),
+            ring=s.base_ring()))
+
+        self._triangles=triangles
+        self._sources=sources
+        SurfaceMapping.__init__(self, s, s2)
+
+    def push_vector_forward(self,tangent_vector):
+        r"""Applies the mapping to the provided vector."""
+        ring = tangent_vector.bundle().base_ring()
+        l = tangent_vector.polygon_label()
+        point = tangent_vector.point()
+        v = tangent_vector.vector()
+        pieces = self._triangles.get(l)
+        if pieces is None:
+            return self._codomain.tangent_vector(l, point, v, ring=ring)
+        for lab,triangle,translation in pieces:
+            p = point-translation
+            pos = triangle.get_point_position(p)
+            if pos.is_outside():
+                continue
+            if pos.is_vertex():
+                # Check that the vector points into this triangle.
+                i = pos.get_vertex()
+                if wedge_product(triangle.edge(i),v)<0 or \
+                    wedge_product(triangle.edge(i-1),v)<0:
+                    continue
+            # If the point lies on a diagonal and the vector points out of
+            # this triangle, the tangent vector is moved across the diagonal.
+            return self._codomain.tangent_vector(lab, p, v, ring=ring)
+        raise ValueError("Unable to find a triangle containing the tangent vector.")
+
+    def pull_vector_back(self,tangent_vector):
+        r"""Applies the pullback mapping to the provided vector."""
+        ring = tangent_vector.bundle().base_ring()
+        lab = tangent_vector.polygon_label()
+        if lab in self._sources:
+            l,translation = self._sources[lab]
+            return self._domain.tangent_vector(l, \
+                tangent_vector.point()+translation, \
+                tangent_vector.vector(), \
+                ring = ring)
+        return self._domain.tangent_vector(lab, \
+            tangent_vector.point(), \
+            tangent_vector.vector(), \
+            ring = ring)
+
 def triangulation_mapping(s):
     r"""Return a  SurfaceMapping triangulating the provided surface.
     
@@ -605,16 +720,10 @@ def triangulation_mapping(s):
         Polygon: (0, 0), (-1/2*sqrt2 - 1, -1/2*sqrt2), (-1/2*sqrt2, -1/2*sqrt2)
     """
     assert(s.is_finite())
-    m=subdivide_a_polygon(s)
-    if m is None:
-        return None
-    s1=m.codomain()
-    while True:
-        m2=subdivide_a_polygon(s1)
-        if m2 is None:
-            return m
-        s1=m2.codomain()
-        m=SurfaceMappingComposition(m,m2)
+    for l,poly in s.label_iterator(polygons=True):
+        if poly.num_edges()>3:
+            return TriangulationMapping(s)
+    return None
     
 def edge_needs_flip_Linfinity(s, p1, e1):
     r"""
@@ -699,63 +808,330 @@ def one_delaunay_flip_mapping(s):
 #    sim=sim1*sim2
 #    return sim[1][0] == 0
 
+def _clip_to_half_plane(vertices, direction):
+    r"""
+    Return the vertices of the part of the convex polygon with the provided
+    vertices lying to the left of the line through the origin in the given
+    direction, or None if this part has zero area.
+    """
+    n = len(vertices)
+    wp = [wedge_product(direction, a) for a in vertices]
+    clipped = []
+    for i in xrange(n):
+        a = vertices[i]
+        wa = wp[i]
+        wb = wp[(i+1)%n]
+        if wa >= 0:
+            clipped.append(a)
+        if (wa > 0 and wb < 0) or (wa < 0 and wb > 0):
+            clipped.append(a + (wa/(wa-wb))*(vertices[(i+1)%n]-a))
+    n = len(clipped)
+    area = sum(wedge_product(clipped[i], clipped[(i+1)%n]) for i in xrange(n))
+    if area <= 0:
+        return None
+    return clipped
+
+def _region_contains(vertices, point):
+    r"""
+    Return whether the closed convex polygon with the provided vertices
+    contains the point.
+    """
+    n = len(vertices)
+    for i in xrange(n):
+        a = vertices[i]
+        if wedge_product(vertices[(i+1)%n]-a, point-a) < 0:
+            return False
+    return True
+
+def _convex_hull(points):
+    r"""
+    Return the vertices of the convex hull of the provided points in
+    counterclockwise order (without flat vertices).
+    """
+    points = sorted(set(tuple(p) for p in points))
+    if len(points) <= 2:
+        return [vector(p) for p in points]
+    points = [vector(p) for p in points]
+    def half_hull(points):
+        hull = []
+        for p in points:
+            while len(hull) >= 2 and wedge_product(hull[-1]-hull[-2], p-hull[-1]) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull
+    lower = half_hull(points)
+    upper = half_hull(reversed(points))
+    return lower[:-1] + upper[:-1]
+
+def _merge_pieces(piece_list):
+    r"""
+    Return the list of pieces (see :class:`CompiledSurfaceMapping`) where the
+    pieces with the same domain label and the same similarity are merged.
+
+    Such pieces are parts of the intersection of a codomain polygon with the
+    image of a domain polygon, which is convex. So their union is the convex
+    hull of their regions. This keeps the number of pieces of a polygon
+    independent of the number of flips that produced it.
+
+    EXAMPLES::
+
+        sage: from flatsurf.geometry.mappings import _merge_pieces
+        sage: from flatsurf.geometry.similarity import SimilarityGroup
+        sage: G = SimilarityGroup(QQ)
+        sage: V = QQ^2
+        sage: pieces = [(0, [V((0,0)), V((1,0)), V((1,1))], G.one()),
+        ....:           (0, [V((0,0)), V((1,1)), V((0,1))], G.one()),
+        ....:           (1, [V((0,0)), V((1,1)), V((0,1))], G(1,0,1,0))]
+        sage: merged = _merge_pieces(pieces)
+        sage: len(merged)
+        2
+        sage: merged[0][1]
+        [(0, 0), (1, 0), (1, 1), (0, 1)]
+    """
+    regions = {}
+    keys = []
+    for l, region, h in piece_list:
+        key = (l, h)
+        if key in regions:
+            regions[key].extend(region)
+        else:
+            regions[key] = list(region)
+            keys.append(key)
+    if len(keys) == len(piece_list):
+        return piece_list
+    return [(l, _convex_hull(regions[(l,h)]), h) for l,h in keys]
+
+def _points_into_vertex_sector(polygon, v, vector):
+    r"""
+    Return whether the vector based at vertex v of polygon points into the
+    polygon (or along one of the two edges adjacent to the vertex).
+    """
+    return wedge_product(polygon.edge(v), vector) >= 0 and \
+        wedge_product(polygon.edge(v-1), vector) >= 0
+
+class CompiledSurfaceMapping(SurfaceMapping):
+    r"""
+    A mapping stored as the list of pieces each polygon of the codomain is
+    made of.
+
+    Contrary to a :class:`SurfaceMappingComposition`, the cost of pushing
+    forward or pulling back a tangent vector does not depend on how the
+    mapping was built but only on the number of pieces of the polygons
+    involved.
+
+    INPUT:
+
+    - ``domain``, ``codomain`` -- the domain and codomain of the mapping
+
+    - ``pieces`` -- a dictionary sending each label of the codomain to a list
+      of triples ``(label, region, h)``. Here ``label`` is a label of the
+      domain, ``h`` is a similarity sending the coordinates of the codomain
+      polygon to the coordinates of the domain polygon with label ``label``
+      and ``region`` is the list of vertices (in codomain coordinates) of the
+      convex part of the codomain polygon which is sent by ``h`` into this
+      domain polygon. The regions of all the pieces must cover the codomain
+      polygon and their images must cover the domain polygons.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.mappings import delaunay_triangulation_mapping
+        sage: s0 = translation_surfaces.octagon_and_squares()
+        sage: a = s0.base_ring().gens()[0]
+        sage: s = Matrix([[1,2+a],[0,1]])*s0
+        sage: m = delaunay_triangulation_mapping(s)
+        sage: m
+        CompiledSurfaceMapping
+        sage: TestSuite(m.codomain()).run()
+        sage: p = s.polygon(0)
+        sage: c = sum(p.vertex(i) for i in range(p.num_edges())) / p.num_edges()
+        sage: v = s.tangent_vector(0, c, (1,0))
+        sage: m.pull_vector_back(m.push_vector_forward(v)) == v
+        True
+        sage: v = s.tangent_vector(0, p.vertex(0), p.edge(0))
+        sage: m.pull_vector_back(m.push_vector_forward(v)) == v
+        True
+    """
+    def __init__(self, domain, codomain, pieces):
+        self._pieces = pieces
+        self._preimages = {}
+        for cl, piece_list in pieces.iteritems():
+            for l, region, h in piece_list:
+                self._preimages.setdefault(l, []).append((cl, region, ~h))
+        SurfaceMapping.__init__(self, domain, codomain)
+
+    def __repr__(self):
+        return "CompiledSurfaceMapping"
+
+    def pieces(self, label):
+        r"""
+        Return the list of pieces ``(domain label, region, similarity)`` the
+        codomain polygon with the provided label is made of.
+        """
+        return self._pieces[label]
+
+    def push_vector_forward(self,tangent_vector):
+        r"""Applies the mapping to the provided vector."""
+        ring = tangent_vector.bundle().base_ring()
+        point = tangent_vector.point()
+        vector = tangent_vector.vector()
+        for cl, region, g in self._preimages[tangent_vector.polygon_label()]:
+            q = g(point)
+            if not _region_contains(region, q):
+                continue
+            w = g.derivative()*vector
+            polygon = self._codomain.polygon(cl)
+            pos = polygon.get_point_position(q)
+            if pos.is_vertex() and \
+                not _points_into_vertex_sector(polygon, pos.get_vertex(), w):
+                continue
+            return self._codomain.tangent_vector(cl, q, w, ring = ring)
+        raise ValueError("Unable to find a piece containing the tangent vector.")
+
+    def pull_vector_back(self,tangent_vector):
+        r"""Applies the inverse of the mapping to the provided vector."""
+        ring = tangent_vector.bundle().base_ring()
+        point = tangent_vector.point()
+        vector = tangent_vector.vector()
+        for l, region, h in self._pieces[tangent_vector.polygon_label()]:
+            if not _region_contains(region, point):
+                continue
+            p = h(point)
+            w = h.derivative()*vector
+            polygon = self._domain.polygon(l)
+            pos = polygon.get_point_position(p)
+            if pos.is_vertex() and \
+                not _points_into_vertex_sector(polygon, pos.get_vertex(), w):
+                continue
+            return self._domain.tangent_vector(l, p, w, ring = ring)
+        raise ValueError("Unable to find a piece containing the tangent vector.")
+
+def _mapping_pieces(s, m):
+    r"""
+    Return the pieces (see :class:`CompiledSurfaceMapping`) of the polygons
+    of the codomain of the mapping ``m`` with domain ``s``.
+
+    The mapping ``m`` must be None (standing for the identity of ``s``), a
+    :class:`TriangulationMapping` or a :class:`CompiledSurfaceMapping`.
+    """
+    if isinstance(m, CompiledSurfaceMapping):
+        return {l:list(piece_list) for l,piece_list in m._pieces.iteritems()}
+    from flatsurf.geometry.similarity import SimilarityGroup
+    ring=s.base_ring()
+    G=SimilarityGroup(ring)
+    s1 = s if m is None else m.codomain()
+    pieces={}
+    for l,poly in s1.label_iterator(polygons=True):
+        region=[poly.vertex(i) for i in xrange(poly.num_edges())]
+        if m is not None and l in m._sources:
+            ll,t=m._sources[l]
+            pieces[l]=[(ll,region,G(ring.one(),ring.zero(),t[0],t[1]))]
+        else:
+            pieces[l]=[(l,region,G.one())]
+    return pieces
+
 def delaunay_triangulation_mapping(s):
     r"""
     Returns a mapping to a Delaunay triangulation or None if the surface already is Delaunay triangulated.
+
+    The flips are performed in place on a copy of the triangulated surface
+    and the pieces of the triangles are tracked along the way, so that the
+    returned :class:`CompiledSurfaceMapping` does not depend on the number of
+    flips performed.
     """
     assert(s.is_finite())
+    from flatsurf.geometry.similarity import SimilarityGroup
+    from flatsurf.geometry.surface import Surface_fast
     m=triangulation_mapping(s)
     if m is None:
         s1=s
     else: 
         s1=m.codomain()
-    m1=one_delaunay_flip_mapping(s1)
-    if m1 is None:
+    ss=s1.__class__(Surface_fast(s1, mutable=True, dictionary=True))
+
+    ring=s.base_ring()
+    G=SimilarityGroup(ring)
+    pieces=_mapping_pieces(s, m)
+
+    def record_flip(l1,e1):
+        l2,e2=ss.opposite_edge(l1,e1)
+        p1=ss.polygon(l1)
+        p2=ss.polygon(l2)
+        sim=ss.edge_transformation(l2,e2)
+        S=~G(sim)
+        # The translations from the frames of the flipped triangles to the
+        # frame of p1 (see triangle_flip).
+        v1=p1.vertex((e1+2)%3)
+        v2=sim(p2.vertex((e2+2)%3))
+        hol=v2-v1
+        A=G(ring.one(),ring.zero(),v1[0],v1[1])
+        B=G(ring.one(),ring.zero(),v2[0],v2[1])
+        # A triangle glued to itself is replaced by the first triangle only.
+        if l1==l2:
+            flipped=((l1,A,hol),)
+        else:
+            flipped=((l1,A,hol),(l2,B,-hol))
+        new_pieces=[]
+        for l0,T,direction in flipped:
+            new_list=[]
+            for U,piece_list in ((T,pieces[l1]),(S*T,pieces[l2])):
+                g=~U
+                for l,region,h in piece_list:
+                    region=_clip_to_half_plane([g(x) for x in region], direction)
+                    if region is not None:
+                        new_list.append((l,region,h*U))
+            new_pieces.append((l0,_merge_pieces(new_list)))
+        for l0,piece_list in new_pieces:
+            pieces[l0]=piece_list
+
+    num_flips=ss.delaunay_flip_edges(flip_callback=record_flip)
+    if num_flips==0:
         return m
-    if m is None:
-        m=m1
-    else:
-        m=SurfaceMappingComposition(m,m1)
-    s1=m1.codomain()
-    while True:
-        m1=one_delaunay_flip_mapping(s1)
-        if m1 is None:
-            return m
-        s1=m1.codomain()
-        m=SurfaceMappingComposition(m,m1)
+    ss.underlying_surface().make_immutable()
+    return CompiledSurfaceMapping(s, ss, pieces)
 
 def delaunay_decomposition_mapping(s):
     r"""
     Returns a mapping to a Delaunay decomposition or possibly None if the surface already is Delaunay.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.mappings import delaunay_decomposition_mapping
+        sage: s0 = translation_surfaces.octagon_and_squares()
+        sage: a = s0.base_ring().gens()[0]
+        sage: s = Matrix([[1,2+a],[0,1]])*s0
+        sage: m = delaunay_decomposition_mapping(s)
+        sage: m.codomain().num_polygons()
+        3
+        sage: TestSuite(m.codomain()).run()
+        sage: p = s.polygon(1)
+        sage: c = sum(p.vertex(i) for i in range(p.num_edges())) / p.num_edges()
+        sage: v = s.tangent_vector(1, c, (0,1))
+        sage: m.pull_vector_back(m.push_vector_forward(v)) == v
+        True
     """
+    from flatsurf.geometry.surface import Surface_fast
     m=delaunay_triangulation_mapping(s)
     if m is None:
         s1=s
     else:
         s1=m.codomain()
-    edge_vectors=[]
-    for p,poly in s1.label_iterator(polygons=True):
-        for e in range(poly.num_edges()):
-            pp,ee=s1.opposite_edge(p,e)
-            if (p<pp or (p==pp and e<ee)) and s1._edge_needs_join(p,e):
-                edge_vectors.append( s1.tangent_vector(p,poly.vertex(e),poly.edge(e)) )
-    if len(edge_vectors)>0:
-        ev=edge_vectors.pop()
-        p,e=ev.edge_pointing_along()
-        m1=SimilarityJoinPolygonsMapping(s1,p,e)
-        s2=m1.codomain()
-        while len(edge_vectors)>0:
-            ev=edge_vectors.pop()
-            ev2=m1.push_vector_forward(ev)
-            p,e=ev2.edge_pointing_along()
-            mtemp=SimilarityJoinPolygonsMapping(s2,p,e)
-            m1=SurfaceMappingComposition(m1,mtemp)
-            s2=m1.codomain()
-        if m is None:
-            return m1
-        else:
-            return SurfaceMappingComposition(m,m1)
-    return m
+    ss=s1.__class__(Surface_fast(s1, mutable=True, dictionary=True))
+    cells=ss._join_delaunay_cells()
+    if all(len(cell)==1 for cell in cells.itervalues()):
+        return m
+    pieces=_mapping_pieces(s, m)
+    new_pieces={}
+    for root,cell in cells.iteritems():
+        piece_list=[]
+        for t,g in cell:
+            gi=~g
+            for l,region,h in pieces[t]:
+                piece_list.append((l,[g(x) for x in region],h*gi))
+        new_pieces[root]=_merge_pieces(piece_list)
+    ss.underlying_surface().make_immutable()
+    return CompiledSurfaceMapping(s, ss, new_pieces)
     
 def canonical_first_vertex(polygon):
     r"""
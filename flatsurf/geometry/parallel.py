@@ -0,0 +1,325 @@
+r"""
+Parallel computations on translation surfaces.
+
+The surface is sent once to each worker process. The tasks (directions or
+samples) are then distributed among the workers, and only compact results
+come back.
+
+EXAMPLES::
+
+    sage: from flatsurf import *
+    sage: from flatsurf.geometry.parallel import flow_directions
+    sage: t = translation_surfaces.square_torus()
+    sage: alphabet = {(0,0): 'a', (0,1): 'b', (0,2):'a', (0,3): 'b'}
+    sage: for r in flow_directions(t, (0, (1/5,1/7)), [(1,1), (1,2)], 100, alphabet):
+    ....:     print("{} {} {} {}".format(r.direction, ''.join(r.coding), r.closed, r.end))
+    (1, 1) ba True (0, (2/35, 1))
+    (1, 2) aba True (0, (9/70, 1))
+
+The results come in the order of the directions whatever the number of
+processes::
+
+    sage: directions = [(1,k) for k in range(1,20)]
+    sage: serial = list(flow_directions(t, (0, (1/5,1/7)), directions, 100, processes=1))
+    sage: parallel = list(flow_directions(t, (0, (1/5,1/7)), directions, 100, processes=2, chunksize=3))
+    sage: serial == parallel
+    True
+"""
+import math
+import random
+from collections import namedtuple
+
+TrajectoryResult = namedtuple("TrajectoryResult",
+        ["direction", "coding", "closed", "saddle_connection", "end"])
+
+CountingEstimate = namedtuple("CountingEstimate", ["samples", "mean", "error"])
+
+# data shared by all the tasks of a worker process (set by _init_worker or
+# _init_sampler)
+_worker_data = None
+
+def _serial_imap(initializer, initargs, function, tasks):
+    r"""
+    Iterate over the images of ``tasks`` by ``function`` in the current
+    process, with the worker data set by ``initializer(*initargs)`` as in a
+    worker process. The previous worker data is restored at the end.
+    """
+    global _worker_data
+    data = _worker_data
+    initializer(*initargs)
+    try:
+        for task in tasks:
+            yield function(task)
+    finally:
+        _worker_data = data
+
+def _init_worker(surface, start, steps, alphabet):
+    global _worker_data
+    _worker_data = (surface, start, steps, alphabet)
+
+def _flow_direction(direction):
+    r"""
+    Flow the trajectory in the given direction with the data of the current
+    worker and return a :class:`TrajectoryResult`.
+    """
+    from flatsurf.geometry.straight_line_trajectory import CodingRecorder, ClosureDetector
+    surface, start, steps, alphabet = _worker_data
+    label, point = start
+    v = surface.tangent_vector(label, point, direction)
+    coding = CodingRecorder(alphabet)
+    closure = ClosureDetector()
+    seg = None
+    for seg in v.straight_line_segment_iterator(steps, [coding, closure]):
+        pass
+    end = seg.end()
+    saddle_connection = v.is_based_at_singularity() and seg.end_is_singular()
+    return TrajectoryResult(direction, coding.coding, closure.closed,
+            saddle_connection, (end.polygon_label(), end.point()))
+
+def flow_directions(surface, start, directions, steps, alphabet=None,
+        processes=None, chunksize=1):
+    r"""
+    Iterate over the results of the forward straight-line flow from ``start``
+    in each of the ``directions``.
+
+    INPUT:
+
+    - ``surface`` -- an immutable similarity surface
+
+    - ``start`` -- a pair ``(label, point)``
+
+    - ``directions`` -- an iterable of directions
+
+    - ``steps`` -- the maximal number of segments of each trajectory (at
+      least one)
+
+    - ``alphabet`` -- an optional dictionary ``(label, edge) -> letter`` used
+      for the codings (see
+      :class:`~flatsurf.geometry.straight_line_trajectory.CodingRecorder`)
+
+    - ``processes`` -- the number of worker processes (by default the number
+      of CPUs). If ``processes`` is ``1`` everything is done in the current
+      process.
+
+    - ``chunksize`` -- the number of directions sent at once to a worker
+
+    OUTPUT:
+
+    A :class:`TrajectoryResult` for each direction, in the order of
+    ``directions``. Its fields are the direction, the coding, whether the
+    trajectory is closed, whether it is a saddle connection and its final
+    point as a pair ``(label, point)``.
+
+    EXAMPLES:
+
+    A trajectory is a saddle connection only if it starts and ends at a
+    singularity::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.parallel import flow_directions
+        sage: t = translation_surfaces.square_torus()
+        sage: [r.saddle_connection for r in flow_directions(t, (0, (0,0)), [(1,1)], 10, processes=1)]
+        [True]
+        sage: [r.saddle_connection for r in flow_directions(t, (0, (1/2,1/2)), [(1,1)], 10, processes=1)]
+        [False]
+
+    The arguments are checked when the iterator is created::
+
+        sage: flow_directions(t, (0, (1/2,1/2)), [(1,1)], 0)
+        Traceback (most recent call last):
+        ...
+        ValueError: steps must be positive
+        sage: flow_directions(t.mutable_copy(), (0, (1/2,1/2)), [(1,1)], 10)
+        Traceback (most recent call last):
+        ...
+        ValueError: the surface must be immutable
+    """
+    if surface.is_mutable():
+        raise ValueError("the surface must be immutable")
+    if steps < 1:
+        raise ValueError("steps must be positive")
+    return _flow_directions(surface, start, directions, steps, alphabet,
+            processes, chunksize)
+
+def _flow_directions(surface, start, directions, steps, alphabet, processes,
+        chunksize):
+    r"""
+    Iterator behind :func:`flow_directions` (whose arguments are checked
+    before the iteration starts).
+    """
+    if processes == 1:
+        for result in _serial_imap(_init_worker, (surface, start, steps, alphabet),
+                _flow_direction, directions):
+            yield result
+        return
+
+    from multiprocessing import Pool
+    pool = Pool(processes, _init_worker, (surface, start, steps, alphabet))
+    try:
+        for result in pool.imap(_flow_direction, directions, chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+def _init_sampler(surface, length_bound, t, seed):
+    global _worker_data
+    _worker_data = (surface, length_bound, t, seed)
+
+def _rational_approximation(x):
+    from sage.rings.rational_field import QQ
+    return QQ(int(round(x * 2**30))) / 2**30
+
+def _random_matrix(rng, t, ring):
+    r"""
+    Return a matrix ``r_theta g_t`` with coefficients in ``ring`` where
+    ``theta`` is random.
+
+    To keep exact coefficients, the rotation is built from a rational
+    approximation of ``tan(theta/2)`` and ``e^t`` is approximated by a
+    rational. Since the rotation by ``pi`` does not change the lengths, the
+    angle ``theta`` is taken in ``[-pi/2, pi/2)``.
+    """
+    from sage.matrix.constructor import matrix
+    theta = rng.uniform(-math.pi/2, math.pi/2)
+    u = _rational_approximation(math.tan(theta / 2))
+    c = (1 - u*u) / (1 + u*u)
+    s = 2*u / (1 + u*u)
+    l = _rational_approximation(math.exp(t))
+    return matrix(ring, [[c, -s], [s, c]]) * matrix(ring, [[l, 0], [0, 1/l]])
+
+def _count_sample(i):
+    r"""
+    Return the number of saddle connections of the ``i``-th random surface
+    of the current worker data.
+
+    The random generator of the sample only depends on the seed and on
+    ``i``, so that the result does not depend on the worker.
+    """
+    from flatsurf.geometry.surface import Surface_fast
+    from flatsurf.geometry.saddle_connection import SaddleConnectionEnumerator
+    surface, length_bound, t, seed = _worker_data
+    rng = random.Random(seed * 2**32 + i)
+    m = _random_matrix(rng, t, surface.base_ring())
+    s = surface.__class__(Surface_fast(m * surface, mutable=False))
+    return SaddleConnectionEnumerator(s).count(length_bound)
+
+def _normal_quantile(confidence):
+    r"""
+    Return ``z`` such that a standard normal variable is in ``[-z, z]``
+    with probability ``confidence``.
+    """
+    a, b = 0.0, 40.0
+    for _ in xrange(100):
+        z = (a + b) / 2
+        if math.erf(z / math.sqrt(2)) < confidence:
+            a = z
+        else:
+            b = z
+    return (a + b) / 2
+
+def estimate_counting_constant(surface, length_bound, samples, t=0, seed=0,
+        confidence=0.95, precision=None, min_samples=10, processes=None,
+        chunksize=1):
+    r"""
+    Iterate over running Monte Carlo estimates of the counting constant of
+    saddle connections in the ``GL(2,R)``-orbit of ``surface``.
+
+    Each sample is a surface ``r_theta g_t surface`` where ``g_t`` is the
+    diagonal matrix ``(e^t, e^{-t})`` and ``r_theta`` the rotation by a
+    uniformly random angle. Its saddle connections of length at most
+    ``length_bound`` (counted in both orientations) are counted with
+    :class:`~flatsurf.geometry.saddle_connection.SaddleConnectionEnumerator`
+    and normalized by ``pi length_bound^2 / area``.
+
+    INPUT:
+
+    - ``surface`` -- an immutable finite translation surface
+
+    - ``length_bound`` -- the length up to which saddle connections are
+      counted
+
+    - ``samples`` -- the maximal number of samples
+
+    - ``t`` -- the time of the Teichmueller geodesic flow
+
+    - ``seed`` -- the seed of the random generators. The ``i``-th sample
+      only depends on ``seed`` and ``i``, so that the results are
+      reproducible whatever the number of processes.
+
+    - ``confidence`` -- the level of the confidence intervals
+
+    - ``precision`` -- if provided, the iteration stops as soon as the half
+      width of the confidence interval is at most ``precision`` (and at least
+      ``min_samples`` samples were taken)
+
+    - ``processes``, ``chunksize`` -- see :func:`flow_directions`
+
+    OUTPUT:
+
+    After each sample, a :class:`CountingEstimate` made of the number of
+    samples, the mean of the normalized counts and the half width of the
+    confidence interval around it (computed with a normal approximation).
+
+    EXAMPLES:
+
+    The counts are invariant under rotation on the torus, and the counting
+    constant is `6/\pi^2`::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.parallel import estimate_counting_constant
+        sage: t = translation_surfaces.square_torus()
+        sage: for e in estimate_counting_constant(t, 10, 3, processes=1):
+        ....:     print("{} {:.4f} {:.4f}".format(e.samples, e.mean, e.error))
+        1 0.6112 inf
+        2 0.6112 0.0000
+        3 0.6112 0.0000
+        sage: 6 / pi.n()^2
+        0.607927101854027
+
+    The estimates do not depend on the number of processes::
+
+        sage: O = translation_surfaces.regular_octagon()
+        sage: serial = list(estimate_counting_constant(O, 3, 4, t=1/2, processes=1))
+        sage: parallel = list(estimate_counting_constant(O, 3, 4, t=1/2, processes=2))
+        sage: serial == parallel
+        True
+    """
+    if surface.is_mutable():
+        raise ValueError("the surface must be immutable")
+    scale = float(surface.area()) / (math.pi * float(length_bound)**2)
+    z = _normal_quantile(confidence)
+
+    if processes == 1:
+        pool = None
+        results = _serial_imap(_init_sampler, (surface, length_bound, t, seed),
+                _count_sample, xrange(samples))
+    else:
+        from multiprocessing import Pool
+        pool = Pool(processes, _init_sampler, (surface, length_bound, t, seed))
+        results = pool.imap(_count_sample, xrange(samples), chunksize)
+
+    # running mean and sum of squared deviations (Welford's algorithm)
+    n = 0
+    mean = 0.0
+    m2 = 0.0
+    try:
+        for count in results:
+            x = count * scale
+            n += 1
+            delta = x - mean
+            mean += delta / n
+            m2 += delta * (x - mean)
+            if n == 1:
+                error = float("inf")
+            else:
+                error = z * math.sqrt(m2 / (n - 1) / n)
+            yield CountingEstimate(n, mean, error)
+            if precision is not None and n >= min_samples and error <= precision:
+                break
+    finally:
+        if pool is None:
+            results.close()
+        else:
+            pool.terminate()
+            pool.join()
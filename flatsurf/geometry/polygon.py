@@ -282,6 +282,15 @@ class ConvexPolygon(Element):
         V = parent.vector_space()
         self._v = tuple(map(V, vertices))
         for vv in self._v: vv.set_immutable()
+        n = len(self._v)
+        self._e = tuple(self._v[(i+1)%n] - self._v[i] for i in xrange(n))
+        for e in self._e: e.set_immutable()
+        # Lazily computed data (polygons are immutable)
+        self._area = None
+        self._squared_lengths = None
+        self._angles = {}
+        self._strictly_convex = None
+        self._fan = None
         self._convexity_check()
 
     def __hash__(self):
@@ -336,6 +345,62 @@ class ConvexPolygon(Element):
                 return False
         return True
 
+    def triangulation(self):
+        r"""
+        Return a triangulation of this polygon as a list of triples of vertex
+        indices.
+
+        The polygon is cut in a single pass by repeatedly cutting off a
+        triangle at a strictly convex vertex. Each triple lists the vertices of
+        a triangle in counterclockwise order. For a strictly convex polygon
+        this is the fan from vertex 0, the last triangle being the one
+        starting at vertex 0.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: polygons.square().triangulation()
+            [(2, 0, 1), (0, 2, 3)]
+            sage: polygons.regular_ngon(8).triangulation()
+            [(2, 0, 1), (3, 0, 2), (4, 0, 3), (5, 0, 4), (6, 0, 5), (0, 6, 7)]
+
+        Vertices which are not strictly convex are never used as the tip of a
+        triangle::
+
+            sage: p = polygons(vertices=[(2,0),(1,1),(0,0),(1,0)])
+            sage: p.triangulation()
+            [(3, 1, 2), (1, 3, 0)]
+        """
+        n = self.num_edges()
+        nxt = [(i+1)%n for i in xrange(n)]
+        prv = [(i-1)%n for i in xrange(n)]
+        # strict[j] is whether the angle at vertex j is less than pi
+        strict = [wedge_product(self.edge(j-1), self.edge(j)) != 0 for j in xrange(n)]
+        num_strict = sum(strict)
+        triangles = []
+        remaining = n
+        j = 1
+        while remaining > 3:
+            i = prv[j]
+            k = nxt[j]
+            if strict[j]:
+                # After removing j, the vertices i and k become strictly
+                # convex. We need to keep at least three strictly convex
+                # vertices for the remaining polygon to be non-degenerate.
+                new_strict = num_strict - 1 + (not strict[i]) + (not strict[k])
+                if new_strict >= 3:
+                    triangles.append((k,i,j))
+                    nxt[i] = k
+                    prv[k] = i
+                    strict[i] = strict[k] = True
+                    num_strict = new_strict
+                    remaining -= 1
+                    j = k
+                    continue
+            j = k
+        triangles.append((prv[j],j,nxt[j]))
+        return triangles
+
     def _convexity_check(self):
         r"""
         TESTS::
@@ -453,6 +518,18 @@ class ConvexPolygon(Element):
             point positioned on interior of edge 2 of polygon
             sage: print p.get_point_position(V([5/2,1/4]))
             point positioned in interior of polygon
+
+        Polygons with many edges use a binary search::
+
+            sage: p = polygons.regular_ngon(30)
+            sage: V = p.vector_space()
+            sage: points = [p.vertex(i) for i in range(30)]
+            sage: points += [(p.vertex(i)+p.vertex(i+1))/2 for i in range(30)]
+            sage: points += [(p.vertex(i)+p.vertex(i+7))/2 for i in range(30)]
+            sage: points += [2*p.vertex(i) - p.vertex(i+1) for i in range(30)]
+            sage: points += [V((1/2,1/3)), V((-1,0)), V((0,100))]
+            sage: all(str(p.get_point_position(q)) == str(p._get_point_position_linear(q, p.vertex(0))) for q in points)
+            True
         """
         V = self.vector_space()
         if translation is None:
@@ -461,6 +538,64 @@ class ConvexPolygon(Element):
         else:
             # Since we allow the initial vertex to be non-zero, this changed:
             v1=translation+self.vertex(0)
+        if self._use_binary_search():
+            pos = self._get_point_position_fan(point, v1)
+            if pos is not None:
+                return pos
+        return self._get_point_position_linear(point, v1)
+
+    def _get_point_position_fan(self, point, v0):
+        r"""
+        Locate the point in the polygon whose first vertex is at ``v0`` using
+        a binary search in the fan of diagonals from the first vertex.
+
+        Return None if the point lies on the line through the first or the
+        last edge, in which case :meth:`_get_point_position_linear` should be
+        used.
+        """
+        if self._fan is None:
+            vertices = self._v
+            self._fan = tuple(v - vertices[0] for v in vertices)
+        fan = self._fan
+        n = len(fan)
+        u0 = point[0] - v0[0]
+        u1 = point[1] - v0[1]
+        def w(k):
+            # wedge product of the k-th diagonal with the point
+            d = fan[k]
+            return d[0]*u1 - d[1]*u0
+        w1 = w(1)
+        if w1 < 0 or w(n-1) > 0:
+            return PolygonPosition(PolygonPosition.OUTSIDE)
+        if w1 == 0 or w(n-1) == 0:
+            return None
+        # largest k such that w(k) > 0 (we know that w(1) > 0 > w(n-1))
+        a = 1
+        b = n-2
+        while a < b:
+            c = (a+b+1)//2
+            if w(c) > 0:
+                a = c
+            else:
+                b = c-1
+        e = self._e[a]
+        p0 = point[0] - v0[0] - fan[a][0]
+        p1 = point[1] - v0[1] - fan[a][1]
+        ww = e[0]*p1 - e[1]*p0
+        if ww < 0:
+            return PolygonPosition(PolygonPosition.OUTSIDE)
+        if ww == 0:
+            # On the edge a but not at its start
+            if e[0]*p0 + e[1]*p1 == e[0]*e[0] + e[1]*e[1]:
+                return PolygonPosition(PolygonPosition.VERTEX, vertex=a+1)
+            return PolygonPosition(PolygonPosition.EDGE_INTERIOR, edge=a)
+        return PolygonPosition(PolygonPosition.INTERIOR)
+
+    def _get_point_position_linear(self, point, v1):
+        r"""
+        Locate the point in the polygon whose first vertex is at ``v1`` by
+        checking the edges one after the other.
+        """
         # Below, we only make use of edge vectors:
         for i in range(self.num_edges()):
             v0=v1
@@ -502,50 +637,206 @@ class ConvexPolygon(Element):
         V = self.parent().vector_space()
         if direction == V.zero():
             raise ValueError("Zero vector provided as direction.")
-        v0=self.vertex(0)
-        w=direction
-        from sage.matrix.constructor import matrix
-        for i in range(self.num_edges()):
-            e=self.edge(i)
-            #print "i="+str(i)+" e="+str(e)+" direction="+str(direction)
-            m=matrix([[e[0], -direction[0]],[e[1], -direction[1]]])
-            try:
-                ret=m.inverse()*(point-v0)
-                s=ret[0]
-                t=ret[1]
-                #print "s="+str(s)+" and t="+str(t)
-                # What if the matrix is non-invertible?
-
-                # Answer: You'll get a ZeroDivisionError which means that the edge is parallel
-                # to the direction.
-
-                # s is location it intersects on edge, t is the portion of the direction to reach this intersection
-                if t>0 and 0<=s and s<=1:
-                    # The ray passes through edge i.
-                    if s==1:
-                        # exits through vertex i+1
-                        v0=v0+e
-                        return v0, PolygonPosition(PolygonPosition.VERTEX, vertex= (i+1)%self.num_edges())
-                    if s==0:
-                        # exits through vertex i
-                        return v0, PolygonPosition(PolygonPosition.VERTEX, vertex= i)
-                        # exits through vertex i
-                    # exits through interior of edge i
-                    prod=t*direction
-                    return point+prod, PolygonPosition(PolygonPosition.EDGE_INTERIOR, edge=i)
-            except ZeroDivisionError:
-                # Here we know the edge and the direction are parallel
-                if wedge_product(e,point-v0)==0:
-                    # In this case point lies on the edge.
-                    # We need to work out which direction to move in.
-                    if (point-v0).is_zero() or is_same_direction(e,point-v0):
-                        # exits through vertex i+1
-                        return self.vertex(i+1), PolygonPosition(PolygonPosition.VERTEX, vertex= (i+1)%self.num_edges())
+        return self._flow_to_exit(point, direction, self._exit_edge_range(direction))
+
+    def flow_to_exit_many(self, points, direction):
+        r"""
+        Flow each of the provided points in the given direction until it
+        leaves the polygon.
+
+        This is equivalent to calling :meth:`flow_to_exit` on each point but
+        the work depending only on the direction is done once.
+
+        INPUT:
+
+        - ``points`` -- a list of points in the closure of the polygon
+
+        - ``direction`` -- direction of motion (a vector of non-zero length)
+
+        OUTPUT: a list of pairs (exit point, PolygonPosition)
+
+        EXAMPLES::
+
+            sage: from flatsurf.geometry.polygon import polygons
+            sage: p = polygons.regular_ngon(20)
+            sage: V = p.vector_space()
+            sage: points = [V((1/2,1/10*k)) for k in range(1,6)] + [p.vertex(3)]
+            sage: d = V((1,3))
+            sage: p.flow_to_exit_many(points, d) == [p.flow_to_exit(q, d) for q in points]
+            True
+        """
+        V = self.parent().vector_space()
+        if direction == V.zero():
+            raise ValueError("Zero vector provided as direction.")
+        edge_range = self._exit_edge_range(direction)
+        return [self._flow_to_exit(point, direction, edge_range) for point in points]
+
+    # Polygons with at least that many edges are handled with binary
+    # searches rather than linear scans in get_point_position(), flow() and
+    # flow_to_exit().
+    _BINARY_SEARCH_MIN_EDGES = 12
+
+    def _use_binary_search(self):
+        r"""
+        Return whether binary searches along the edges should be used, which
+        is the case for strictly convex polygons with many edges.
+        """
+        if len(self._e) < self._BINARY_SEARCH_MIN_EDGES:
+            return False
+        if self._strictly_convex is None:
+            self._strictly_convex = self.is_strictly_convex()
+        return self._strictly_convex
+
+    def _exit_edge_range(self, direction):
+        r"""
+        Return a pair ``(lo, m)`` such that the edges ``lo``, ``lo+1``, ...,
+        ``lo+m-1`` (indices modulo the number of edges) are the edges through
+        which a ray in the given direction can leave the polygon, i.e. the
+        edges ``e`` with ``wedge_product(e, direction) < 0``.
+
+        Return None if the polygon is too small or not strictly convex, in
+        which case the edges should be scanned linearly.
+
+        The edge directions of a strictly convex polygon are sorted by angle,
+        which allows to find the range with binary searches.
+        """
+        if not self._use_binary_search():
+            return None
+        n = len(self._e)
+        edges = self._e
+        e0 = edges[0]
+        def upper_half(u):
+            # whether the angle from e0 to u is in [0,pi)
+            w = e0[0]*u[1] - e0[1]*u[0]
+            return w > 0 or (w == 0 and e0[0]*u[0] + e0[1]*u[1] > 0)
+        def less(u, v):
+            # whether the angle from e0 to u is smaller than the one to v
+            hu = upper_half(u)
+            if hu != upper_half(v):
+                return hu
+            return u[0]*v[1] - u[1]*v[0] > 0
+        def first(predicate):
+            # first index i such that predicate(edges[i]) holds (predicate
+            # is monotonic along the edges)
+            a = 0
+            b = n
+            while a < b:
+                c = (a+b)//2
+                if predicate(edges[c]):
+                    b = c
+                else:
+                    a = c+1
+            return a
+        lo = first(lambda e: less(direction, e))
+        hi = first(lambda e: not less(e, -direction))
+        if lo <= hi:
+            m = hi - lo
+        else:
+            m = n - lo + hi
+        if m == 0:
+            return None
+        return lo % n, m
+
+    def _exit_edge(self, point, direction, v0, edge_range, parallel=False):
+        r"""
+        Find the edge through which the ray from ``point`` in ``direction``
+        leaves the polygon whose first vertex is at ``v0``.
+
+        Return a tuple ``(i, s, t, v)`` where ``v`` is the start of the edge
+        ``i`` and the ray hits ``v + s * edge(i)`` at ``point + t *
+        direction``. If ``parallel`` is ``True`` and the first edge met in the
+        scan is parallel to ``direction`` with ``point`` on its line, then
+        ``(i, None, None, v)`` is returned. Return None if no edge is found.
+
+        The parameters are computed in closed form with wedge products:
+        writing ``w = point - v`` and ``D = wedge(e, direction)``, we have
+        ``s = wedge(w, direction)/D`` and ``t = wedge(w, e)/D``.
+        """
+        edges = self._e
+        d0 = direction[0]
+        d1 = direction[1]
+        if edge_range is not None:
+            # binary search along the edges which may be crossed
+            lo, m = edge_range
+            n = len(edges)
+            offset = v0 - self._v[0]
+            q0 = point[0] - offset[0]
+            q1 = point[1] - offset[1]
+            vertices = self._v
+            def f(r):
+                # (signed) distance of the r-th vertex of the range to the
+                # line of the ray. It increases along the range.
+                v = vertices[(lo+r)%n]
+                return d0*(v[1]-q1) - d1*(v[0]-q0)
+            if f(0) <= 0:
+                a = 0
+                b = m-1
+                while a < b:
+                    c = (a+b+1)//2
+                    if f(c) <= 0:
+                        a = c
                     else:
-                        # exits through vertex i
-                        return v0, PolygonPosition(PolygonPosition.VERTEX, vertex= i)
-                pass
-            v0=v0+e
+                        b = c-1
+                i = (lo+a)%n
+                e = edges[i]
+                v = vertices[i] + offset
+                w0 = point[0] - v[0]
+                w1 = point[1] - v[1]
+                D = e[0]*d1 - e[1]*d0
+                t = (w0*e[1] - w1*e[0])/D
+                s = (w0*d1 - w1*d0)/D
+                if t > 0 and 0 <= s and s <= 1:
+                    return i, s, t, v
+            # Not a valid exit (the point is likely not in the polygon):
+            # the linear scan below reports the same as before.
+        v = v0
+        for i in xrange(len(edges)):
+            e = edges[i]
+            w0 = point[0] - v[0]
+            w1 = point[1] - v[1]
+            D = e[0]*d1 - e[1]*d0
+            if D == 0:
+                # the edge and the direction are parallel
+                if parallel and e[0]*w1 - e[1]*w0 == 0:
+                    return i, None, None, v
+            else:
+                t = (w0*e[1] - w1*e[0])/D
+                if t > 0:
+                    s = (w0*d1 - w1*d0)/D
+                    if 0 <= s and s <= 1:
+                        return i, s, t, v
+            v = v + e
+        return None
+
+    def _flow_to_exit(self, point, direction, edge_range):
+        r"""
+        Implementation of :meth:`flow_to_exit` where ``edge_range`` is the
+        output of :meth:`_exit_edge_range`.
+        """
+        n = self.num_edges()
+        ret = self._exit_edge(point, direction, self.vertex(0), edge_range, parallel=True)
+        if ret is not None:
+            i, s, t, v0 = ret
+            e = self.edge(i)
+            if s is None:
+                # In this case point lies on the line through the edge i
+                # which is parallel to the direction.
+                # We need to work out which direction to move in.
+                if (point-v0).is_zero() or is_same_direction(e,point-v0):
+                    # exits through vertex i+1
+                    return self.vertex(i+1), PolygonPosition(PolygonPosition.VERTEX, vertex= (i+1)%n)
+                else:
+                    # exits through vertex i
+                    return v0, PolygonPosition(PolygonPosition.VERTEX, vertex= i)
+            # s is location it intersects on edge, t is the portion of the direction to reach this intersection
+            if s==1:
+                # exits through vertex i+1
+                return v0+e, PolygonPosition(PolygonPosition.VERTEX, vertex= (i+1)%n)
+            if s==0:
+                # exits through vertex i
+                return v0, PolygonPosition(PolygonPosition.VERTEX, vertex= i)
+            # exits through interior of edge i
+            return point+t*direction, PolygonPosition(PolygonPosition.EDGE_INTERIOR, edge=i)
         # Our loop has terminated. This can mean one of several errors...
         pos = self.get_point_position(point)
         if pos.is_outside():
@@ -670,46 +961,27 @@ class ConvexPolygon(Element):
         if holonomy == V.zero():
             # not flowing at all!
             return point, V.zero(), self.get_point_position(point,translation=translation)
-        from sage.matrix.constructor import matrix
         if translation is None:
             v0=self.vertex(0)
         else:
             v0=self.vertex(0)+translation
-        w=holonomy
-        for i in range(self.num_edges()):
-            e=self.edge(i)
-            #print "i="+str(i)+" e="+str(e)
-            m=matrix([[e[0], -holonomy[0]],[e[1], -holonomy[1]]])
-            #print "m="+str(m)
-            #print "diff="+str(point-v0)
-            try:
-                ret=m.inverse()*(point-v0)
-                s=ret[0]
-                t=ret[1]
-                #print "s="+str(s)+" and t="+str(t)
-                # What if the matrix is non-invertible?
-
-                # s is location it intersects on edge, t is the portion of the holonomy to reach this intersection
-                if t>0 and 0<=s and s<=1:
-                    # The ray passes through edge i.
-                    if t>1:
-                        # the segment from point with the given holonomy stays within the polygon
-                        return point+holonomy, V.zero(), PolygonPosition(PolygonPosition.INTERIOR)
-                    if s==1:
-                        # exits through vertex i+1
-                        v0=v0+e
-                        return v0, point+holonomy-v0, PolygonPosition(PolygonPosition.VERTEX, vertex= (i+1)%self.num_edges())
-                    if s==0:
-                        # exits through vertex i
-                        return v0, point+holonomy-v0, PolygonPosition(PolygonPosition.VERTEX, vertex= i)
-                        # exits through vertex i
-                    # exits through interior of edge i
-                    prod=t*holonomy
-                    return point+prod, holonomy-prod, PolygonPosition(PolygonPosition.EDGE_INTERIOR, edge=i)
-            except ZeroDivisionError:
-                # can safely ignore this error. It means that the edge and the holonomy are parallel.
-                pass
-            v0=v0+e
+        ret = self._exit_edge(point, holonomy, v0, self._exit_edge_range(holonomy))
+        if ret is not None:
+            i, s, t, v0 = ret
+            # s is location it intersects on edge, t is the portion of the holonomy to reach this intersection
+            if t>1:
+                # the segment from point with the given holonomy stays within the polygon
+                return point+holonomy, V.zero(), PolygonPosition(PolygonPosition.INTERIOR)
+            if s==1:
+                # exits through vertex i+1
+                v0=v0+self.edge(i)
+                return v0, point+holonomy-v0, PolygonPosition(PolygonPosition.VERTEX, vertex= (i+1)%self.num_edges())
+            if s==0:
+                # exits through vertex i
+                return v0, point+holonomy-v0, PolygonPosition(PolygonPosition.VERTEX, vertex= i)
+            # exits through interior of edge i
+            prod=t*holonomy
+            return point+prod, holonomy-prod, PolygonPosition(PolygonPosition.EDGE_INTERIOR, edge=i)
         # Our loop has terminated. This can mean one of several errors...
         pos = self.get_point_position(point,translation=translation)
         if pos.is_outside():
@@ -718,15 +990,33 @@ class ConvexPolygon(Element):
 
     def edges(self):
         r"""
-        Return an iterator overt the edges
+        Return the list of the edges.
         """
-        return [self.edge(i) for i in range(self.num_edges())]
+        return list(self._e)
 
     def edge(self, i):
         r"""
         Return a vector representing the ``i``-th edge of the polygon.
+
+        The edges are computed once when the polygon is built and the
+        returned vectors are immutable.
+        """
+        return self._e[i % len(self._e)]
+
+    def edge_squared_length(self, i):
+        r"""
+        Return the square of the length of the ``i``-th edge.
+
+        EXAMPLES::
+
+            sage: from flatsurf.geometry.polygon import polygons
+            sage: p = polygons((1,0),(0,2),(-1,0),(0,-2))
+            sage: [p.edge_squared_length(i) for i in range(4)]
+            [1, 4, 1, 4]
         """
-        return self.vertex(i+1) - self.vertex(i)
+        if self._squared_lengths is None:
+            self._squared_lengths = tuple(e[0]*e[0] + e[1]*e[1] for e in self._e)
+        return self._squared_lengths[i % len(self._e)]
 
     def plot(self, translation=None):
         r"""
@@ -752,7 +1042,13 @@ class ConvexPolygon(Element):
             sage: polygons.regular_ngon(8).angle(0)
             3/8
         """
-        return angle(self.edge(e), - self.edge((e-1)%self.num_edges()))
+        e = e % self.num_edges()
+        try:
+            return self._angles[e]
+        except KeyError:
+            a = angle(self.edge(e), - self.edge(e-1))
+            self._angles[e] = a
+            return a
 
     def area(self):
         r"""
@@ -774,12 +1070,15 @@ class ConvexPolygon(Element):
             sage: (2*polygons.square()).area()
             4
         """
+        if self._area is not None:
+            return self._area
         # Will use an area formula obtainable from Green's theorem. See for instance:
         # http://math.blogoverflow.com/2014/06/04/greens-theorem-and-area-of-polygons/
         total = self.field().zero()
         for i in range(self.num_edges()):
             total += (self.vertex(i)[0]+self.vertex(i+1)[0])*self.edge(i)[1]
-        return total/ZZ_2
+        self._area = total/ZZ_2
+        return self._area
 
 
 class ConvexPolygons(UniqueRepresentation, Parent):
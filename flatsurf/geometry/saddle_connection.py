@@ -0,0 +1,455 @@
+r"""
+Saddle connections of half-translation surfaces.
+
+The saddle connections are found by developing the polygons around each
+singularity: from each corner of each polygon, the polygons met by the
+straight lines leaving the corner are unfolded in the plane while keeping
+track of the window of directions that are not blocked by a vertex. A vertex
+found strictly inside the window is the endpoint of a saddle connection.
+
+The development is done by increasing distance to the corner. The windows
+that are too far away for the current length bound are kept so that the
+enumeration can later be resumed with a larger bound, possibly after having
+been saved to a file (see :meth:`SaddleConnectionEnumerator.save`).
+"""
+import os
+from bisect import bisect_right
+from heapq import heappush, heappop
+
+from sage.modules.free_module import VectorSpace
+
+from flatsurf.geometry.polygon import wedge_product, dot_product
+from flatsurf.geometry.similarity import SimilarityGroup
+
+def _squared_distance_to_segment(a, b):
+    r"""
+    Return the squared distance from the origin to the segment ``[a, b]``.
+    """
+    u = b - a
+    if dot_product(a, u) >= 0:
+        return dot_product(a, a)
+    if dot_product(b, u) <= 0:
+        return dot_product(b, b)
+    w = wedge_product(a, b)
+    return w * w / dot_product(u, u)
+
+def canonical_corner(surface, label, v, direction):
+    r"""
+    Return the corner ``(label, vertex)`` of the singularity at the vertex
+    ``v`` of the polygon ``label`` which contains ``direction``.
+
+    The direction, given in the coordinates of the polygon ``label``, must
+    leave the vertex inside the polygon or along one of its two edges. As for
+    tangent vectors, the sector of a corner contains the direction of the
+    edge ``v`` but not the one of the edge ``v-1`` (traversed backward): a
+    direction along the edge ``v-1`` belongs to the polygon on the other side
+    of this edge. This is the convention used for the start and the end of
+    :class:`SaddleConnection`.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.saddle_connection import canonical_corner
+        sage: t = translation_surfaces.square_torus()
+        sage: canonical_corner(t, 0, 1, vector((-1,1)))
+        (0, 1)
+        sage: canonical_corner(t, 0, 1, vector((-1,0)))
+        (0, 2)
+        sage: canonical_corner(t, 0, 1, vector((0,1)))
+        (0, 1)
+    """
+    polygon = surface.polygon(label)
+    e = polygon.edge(v-1)
+    if wedge_product(e, direction) == 0 and dot_product(e, direction) < 0:
+        return surface.opposite_edge(label, (v-1) % polygon.num_edges())
+    return (label, v % polygon.num_edges())
+
+class SaddleConnection(object):
+    r"""
+    A saddle connection on a half-translation surface.
+
+    It is given by the corner ``(label, vertex)`` of the polygon it starts
+    from, its holonomy vector in the coordinates of this polygon and the
+    corner ``(label, vertex)`` of the polygon where it ends. The corners are
+    the ones containing the directions of the saddle connection at its ends
+    (see :func:`canonical_corner`).
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: t = translation_surfaces.square_torus()
+        sage: sc = t.saddle_connections(1)[0]
+        sage: sc
+        Saddle connection with holonomy (1, 0) from vertex 0 of polygon 0 to vertex 2 of polygon 0
+        sage: sc.squared_length()
+        1
+    """
+    def __init__(self, start_data, holonomy, end_data):
+        self._start_data = start_data
+        self._holonomy = holonomy
+        self._holonomy.set_immutable()
+        self._end_data = end_data
+        self._squared_length = dot_product(holonomy, holonomy)
+
+    def __repr__(self):
+        return "Saddle connection with holonomy {} from vertex {} of polygon {} to vertex {} of polygon {}".format(
+                self._holonomy, self._start_data[1], self._start_data[0],
+                self._end_data[1], self._end_data[0])
+
+    def __eq__(self, other):
+        return isinstance(other, SaddleConnection) and \
+            self._start_data == other._start_data and \
+            self._holonomy == other._holonomy and \
+            self._end_data == other._end_data
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self._start_data, self._holonomy, self._end_data))
+
+    def start_data(self):
+        r"""
+        Return the pair ``(label, vertex)`` of the corner where the saddle
+        connection starts.
+        """
+        return self._start_data
+
+    def end_data(self):
+        r"""
+        Return the pair ``(label, vertex)`` of the corner where the saddle
+        connection ends.
+        """
+        return self._end_data
+
+    def holonomy(self):
+        r"""
+        Return the holonomy vector of the saddle connection in the coordinates
+        of the polygon it starts from.
+        """
+        return self._holonomy
+
+    def squared_length(self):
+        r"""
+        Return the square of the length of the saddle connection.
+        """
+        return self._squared_length
+
+class SaddleConnectionEnumerator(object):
+    r"""
+    Enumerate the saddle connections of a finite half-translation surface by
+    increasing length.
+
+    The enumerator remembers where it stopped so that asking for a larger
+    length bound only develops the polygons that were not reached before.
+
+    Every vertex of the polygons is considered as a singularity. The
+    polygons must be strictly convex: a vertex with angle `\pi` is usually
+    not meant as a singularity and the straight lines through it would be
+    reported as saddle connections.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.saddle_connection import SaddleConnectionEnumerator
+        sage: t = translation_surfaces.square_torus()
+        sage: E = SaddleConnectionEnumerator(t)
+        sage: len(E.saddle_connections(1))
+        4
+        sage: len(E.saddle_connections(2))
+        8
+        sage: len(E.saddle_connections(3))
+        16
+
+    The number of saddle connections in the torus is the number of primitive
+    vectors in the disk::
+
+        sage: len(E.saddle_connections(20)) == len([(x,y) for x in range(-20,21) for y in range(-20,21) if x^2+y^2 <= 400 and gcd(x,y) == 1])
+        True
+
+    Polygons with a vertex of angle `\pi` are rejected::
+
+        sage: from flatsurf.geometry.surface import Surface_polygons_and_gluings
+        sage: from flatsurf.geometry.translation_surface import TranslationSurface
+        sage: p = polygons(vertices=[(0,0),(1,0),(2,0),(2,1),(1,1),(0,1)])
+        sage: s = TranslationSurface(Surface_polygons_and_gluings([p], [((0,0),(0,4)), ((0,1),(0,3)), ((0,2),(0,5))]))
+        sage: SaddleConnectionEnumerator(s)
+        Traceback (most recent call last):
+        ...
+        ValueError: the polygons must be strictly convex
+    """
+    def __init__(self, surface):
+        self._setup(surface)
+        for label, polygon in surface.label_polygon_iterator():
+            for v in xrange(polygon.num_edges()):
+                self._start(label, polygon, v)
+
+    def _setup(self, surface):
+        if not surface.is_finite():
+            raise ValueError("the surface must be built from finitely many polygons")
+        if not all(polygon.is_strictly_convex() for label, polygon in surface.label_polygon_iterator()):
+            raise ValueError("the polygons must be strictly convex")
+        self._surface = surface
+        self._G = SimilarityGroup(surface.base_ring())
+        self._zero = VectorSpace(surface.base_ring(), 2).zero()
+        self._transformations = {}
+        self._counter = 0
+
+        # windows which remain to be developed: heap of
+        # (squared distance, counter, (start_data, label, edge, g, u1, u2))
+        self._frontier = []
+        # saddle connections found but longer than the current bound: heap of
+        # (squared length, counter, saddle connection)
+        self._pending = []
+        # saddle connections shorter than the current bound, sorted by length,
+        # and their squared lengths
+        self._found = []
+        self._squared_lengths = []
+        self._squared_bound = None
+
+    def _edge_transformation(self, label, e):
+        try:
+            return self._transformations[label,e]
+        except KeyError:
+            g = self._transformations[label,e] = self._surface.edge_transformation(label, e)
+            return g
+
+    def _push_saddle_connection(self, start_data, holonomy, end_data):
+        sc = SaddleConnection(start_data, holonomy, end_data)
+        self._counter += 1
+        heappush(self._pending, (sc.squared_length(), self._counter, sc))
+
+    def _push_window(self, start_data, label, edge, g, u1, u2, a, b):
+        r"""
+        Add the window of directions between ``u1`` and ``u2`` through the
+        edge ``edge`` of polygon ``label`` whose developed endpoints are ``a``
+        and ``b``.
+        """
+        if wedge_product(u1, a) > 0:
+            u1 = a
+        if wedge_product(b, u2) > 0:
+            u2 = b
+        if wedge_product(u1, u2) <= 0:
+            return
+        self._counter += 1
+        heappush(self._frontier, (_squared_distance_to_segment(a, b), self._counter,
+                    (start_data, label, edge, g, u1, u2)))
+
+    def _start(self, label, polygon, v):
+        r"""
+        Initialize the development from the corner ``v`` of ``polygon``.
+
+        The sector of this corner contains the direction of the edge ``v``
+        but not the one of the edge ``v-1``, so that each direction at a
+        singularity belongs to exactly one corner.
+        """
+        n = polygon.num_edges()
+        o = polygon.vertex(v)
+        g = self._G(1, 0, -o[0], -o[1])
+        start_data = (label, v)
+        vertices = [polygon.vertex(v+i) - o for i in xrange(n)]
+        for i in xrange(1, n-1):
+            self._push_saddle_connection(start_data, vertices[i],
+                    canonical_corner(self._surface, label, v+i, -vertices[i]))
+        u1 = vertices[1]
+        u2 = vertices[n-1]
+        for i in xrange(1, n-1):
+            self._push_window(start_data, label, (v+i)%n, g, u1, u2, vertices[i], vertices[i+1])
+
+    def _develop(self, start_data, label, edge, g, u1, u2):
+        r"""
+        Develop the polygon glued to ``edge`` of the polygon ``label`` (whose
+        coordinates are mapped to the plane by ``g``) and look through the
+        window between ``u1`` and ``u2``.
+        """
+        label2, edge2 = self._surface.opposite_edge(label, edge)
+        g = g * self._edge_transformation(label2, edge2)
+        polygon = self._surface.polygon(label2)
+        n = polygon.num_edges()
+        vertices = [g(polygon.vertex(edge2+i)) for i in xrange(n+1)]
+        # vertices[0] and vertices[1] are the endpoints of the edge we came from
+        origin = None
+        for i in xrange(2, n):
+            p = vertices[i]
+            if wedge_product(u1, p) > 0 and wedge_product(p, u2) > 0:
+                if origin is None:
+                    # the start of the saddle connections in the coordinates
+                    # of this polygon
+                    origin = (~g)(self._zero)
+                v = edge2 + i
+                self._push_saddle_connection(start_data, p,
+                        canonical_corner(self._surface, label2, v, origin - polygon.vertex(v)))
+        for i in xrange(1, n):
+            self._push_window(start_data, label2, (edge2+i)%n, g, u1, u2, vertices[i], vertices[i+1])
+
+    def _extend(self, squared_bound, filename=None, interval=None):
+        r"""
+        Find all the saddle connections whose squared length is at most
+        ``squared_bound``.
+        """
+        if self._squared_bound is not None and squared_bound <= self._squared_bound:
+            return
+        frontier = self._frontier
+        i = 0
+        while frontier and frontier[0][0] <= squared_bound:
+            self._develop(*heappop(frontier)[2])
+            i += 1
+            if filename is not None and i % interval == 0:
+                self.save(filename)
+        pending = self._pending
+        while pending and pending[0][0] <= squared_bound:
+            l, _, sc = heappop(pending)
+            self._found.append(sc)
+            self._squared_lengths.append(l)
+        self._squared_bound = squared_bound
+        if filename is not None:
+            self.save(filename)
+
+    def extend(self, length_bound, filename=None, interval=100000):
+        r"""
+        Find all the saddle connections of length at most ``length_bound``.
+
+        If ``filename`` is provided, the state of the enumerator is saved to
+        this file (see :meth:`save`) every ``interval`` developed polygons
+        and at the end, so that a long computation can be resumed with
+        :meth:`load` after an interruption.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: from flatsurf.geometry.saddle_connection import SaddleConnectionEnumerator
+            sage: O = translation_surfaces.regular_octagon()
+            sage: filename = tmp_filename()
+            sage: E = SaddleConnectionEnumerator(O)
+            sage: E.extend(3, filename, interval=10)
+            sage: F = SaddleConnectionEnumerator.load(O, filename)
+            sage: F.holonomies(3) == E.holonomies(3)
+            True
+            sage: F.holonomies(5) == SaddleConnectionEnumerator(O).holonomies(5)
+            True
+        """
+        self._extend(length_bound * length_bound, filename, interval)
+
+    def saddle_connections(self, length_bound):
+        r"""
+        Return the list of saddle connections of length at most
+        ``length_bound`` sorted by length.
+
+        Each saddle connection appears once in each of its two orientations.
+        """
+        squared_bound = length_bound * length_bound
+        self._extend(squared_bound)
+        return self._found[:bisect_right(self._squared_lengths, squared_bound)]
+
+    def holonomies(self, length_bound):
+        r"""
+        Return the list of holonomy vectors of the saddle connections of
+        length at most ``length_bound`` sorted by length.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: from flatsurf.geometry.saddle_connection import SaddleConnectionEnumerator
+            sage: E = SaddleConnectionEnumerator(translation_surfaces.square_torus())
+            sage: E.holonomies(1)
+            [(1, 0), (0, 1), (-1, 0), (0, -1)]
+        """
+        return [sc.holonomy() for sc in self.saddle_connections(length_bound)]
+
+    def squared_lengths(self, length_bound):
+        r"""
+        Return the sorted list of the squared lengths of the saddle
+        connections of length at most ``length_bound``.
+        """
+        squared_bound = length_bound * length_bound
+        self._extend(squared_bound)
+        return self._squared_lengths[:bisect_right(self._squared_lengths, squared_bound)]
+
+    def count(self, length_bound):
+        r"""
+        Return the number of saddle connections of length at most
+        ``length_bound``.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: from flatsurf.geometry.saddle_connection import SaddleConnectionEnumerator
+            sage: E = SaddleConnectionEnumerator(translation_surfaces.square_torus())
+            sage: [E.count(L) for L in range(1, 6)]
+            [4, 8, 16, 32, 48]
+        """
+        squared_bound = length_bound * length_bound
+        self._extend(squared_bound)
+        return bisect_right(self._squared_lengths, squared_bound)
+
+    def _surface_data(self):
+        r"""
+        Return the polygons and the gluings of the surface, used to check
+        that a saved state belongs to the right surface.
+        """
+        surface = self._surface
+        data = []
+        for label, polygon in surface.label_polygon_iterator():
+            data.append((label, [tuple(v) for v in polygon.vertices()],
+                [surface.opposite_edge(label, e) for e in xrange(polygon.num_edges())]))
+        return data
+
+    def save(self, filename):
+        r"""
+        Save the state of the enumerator to ``filename``.
+
+        The file is replaced atomically, so that an interruption during the
+        save leaves the previous state intact. The surface is not saved and
+        must be provided to :meth:`load`.
+        """
+        frontier = [(d, c, (start_data, label, edge, (g.a(), g.b(), g.s(), g.t()), u1, u2))
+                for d, c, (start_data, label, edge, g, u1, u2) in self._frontier]
+        pending = [(l, c, (sc._start_data, sc._holonomy, sc._end_data))
+                for l, c, sc in self._pending]
+        found = [(sc._start_data, sc._holonomy, sc._end_data) for sc in self._found]
+        state = {"surface": self._surface_data(),
+                 "counter": self._counter,
+                 "squared_bound": self._squared_bound,
+                 "frontier": frontier,
+                 "pending": pending,
+                 "found": found}
+        from sage.misc.persist import dumps
+        tmp = filename + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(dumps(state))
+        os.rename(tmp, filename)
+
+    @classmethod
+    def load(cls, surface, filename):
+        r"""
+        Return the enumerator of saddle connections of ``surface`` saved in
+        ``filename`` (see :meth:`save`).
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: from flatsurf.geometry.saddle_connection import SaddleConnectionEnumerator
+            sage: filename = tmp_filename()
+            sage: E = SaddleConnectionEnumerator(translation_surfaces.square_torus())
+            sage: E.save(filename)
+            sage: SaddleConnectionEnumerator.load(translation_surfaces.regular_octagon(), filename)
+            Traceback (most recent call last):
+            ...
+            ValueError: the saved enumerator belongs to another surface
+        """
+        from sage.misc.persist import loads
+        with open(filename, "rb") as f:
+            state = loads(f.read())
+        E = cls.__new__(cls)
+        E._setup(surface)
+        if state["surface"] != E._surface_data():
+            raise ValueError("the saved enumerator belongs to another surface")
+        G = E._G
+        E._counter = state["counter"]
+        E._squared_bound = state["squared_bound"]
+        E._frontier = [(d, c, (start_data, label, edge, G(*g), u1, u2))
+                for d, c, (start_data, label, edge, g, u1, u2) in state["frontier"]]
+        E._pending = [(l, c, SaddleConnection(*sc)) for l, c, sc in state["pending"]]
+        E._found = [SaddleConnection(*sc) for sc in state["found"]]
+        E._squared_lengths = [sc.squared_length() for sc in E._found]
+        return E
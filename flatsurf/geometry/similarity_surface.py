@@ -353,13 +353,18 @@ class SimilaritySurface(SageObject):
         # This is the similarity carrying (a,b) to (aa,bb):
         return gg*(~g)
 
-    def mutable_copy(self, dictionary=True):
+    def mutable_copy(self, dictionary=True, compact=False):
         r"""
         Returns a mutable copy of this surface.
         
         If dictionary is false, labels will be changed, but the resulting
         surface will be slightly more efficient (as a list will be used
         for storing polygons rather than a dictionary). See Surface_fast.
+
+        If compact is true, the copy is backed by a Surface_compact, which
+        stores the gluings in flat integer arrays. This is intended for
+        surfaces with many edges. As with dictionary=False, the labels are
+        changed into consecutive integers.
         
         EXAMPLES::
 
@@ -376,6 +381,10 @@ class SimilaritySurface(SageObject):
             True
         """
         if self.is_finite():
+            if compact:
+                from flatsurf.geometry.surface import Surface_compact
+                return self.__class__(Surface_compact(surface=self,\
+                    mutable=True))
             from flatsurf.geometry.surface import Surface_fast
             return self.__class__(Surface_fast(surface=self,\
                 mutable=True,dictionary=dictionary))
@@ -626,7 +635,7 @@ class SimilaritySurface(SageObject):
                 glue_list.append((p4,e4))
 
         if s.base_label()==p2:
-             s.change_base_polygon(p1)
+             s.change_base_label(p1)
         s.remove_polygon(p2)
         
         s.change_polygon(p1, new_polygon, glue_list)
@@ -837,6 +846,11 @@ class SimilaritySurface(SageObject):
         r"""
         Return a triangulated version of this surface.
 
+        Each polygon is cut into triangles in a single pass (see
+        :meth:`~flatsurf.geometry.polygon.ConvexPolygon.triangulation`). The
+        last triangle cut from a polygon keeps its label, the other triangles
+        get new labels.
+
         EXAMPLES::
 
             sage: from flatsurf import *
@@ -846,31 +860,51 @@ class SimilaritySurface(SageObject):
             sage: gs.make_all_visible()
             sage: print(gs)
             Graphical version of Similarity Surface TranslationSurface built from 6 polygons
+
+            sage: s=translation_surfaces.regular_octagon()
+            sage: ss=s.triangulate()
+            sage: ss.num_polygons()
+            6
+            sage: all(p.num_edges() == 3 for l,p in ss.label_iterator(polygons=True))
+            True
+            sage: TestSuite(ss).run()
         """
         if in_place:
             s=self
         else:
             s=self.mutable_copy()
-        from flatsurf.geometry.polygon import wedge_product
-        loop=True
-        while loop:
-            loop=False
-            for l,poly in s.label_iterator(polygons=True):
-                n = poly.num_edges() 
-                if n>3:
-                    for i in xrange(n):
-                        e1=poly.edge(i)
-                        e2=poly.edge((i+1)%n)
-                        if wedge_product(e1,e2) != 0:
-                            s.subdivide_polygon(l,i,(i+2)%n)
-                            loop=True
-                            break
-                    if loop:
-                        break
-                    else:
-                        # This should never happen:
-                        raise ValueError("Unable to triangulate polygon with label "+ \
-                            str(l)+": "+str(poly))
+        us=s.underlying_surface()
+        P=Polygons(s.base_ring())
+        for l in list(s.label_iterator()):
+            poly=s.polygon(l)
+            n=poly.num_edges()
+            if n==3:
+                continue
+            # Cut the polygon in one pass. The last triangle keeps the label l.
+            triangles=poly.triangulation()
+            labels=[us.add_polygon(None) for i in xrange(len(triangles)-1)]
+            labels.append(l)
+            # Map ordered pairs of vertices of poly to the new edges.
+            sides={}
+            for lab,t in zip(labels,triangles):
+                for k in xrange(3):
+                    sides[(t[k],t[(k+1)%3])]=(lab,k)
+            gluings=[]
+            for i in xrange(n):
+                ll,ee=s.opposite_edge(l,i)
+                if ll==l:
+                    ll,ee=sides[(ee,(ee+1)%n)]
+                gluings.append((sides[(i,(i+1)%n)],(ll,ee)))
+            for lab,t in zip(labels,triangles):
+                v0,v1,v2=[poly.vertex(i) for i in t]
+                us.change_polygon(lab, P(edges=[v1-v0,v2-v1,v0-v2]))
+            for (a,b),(lab,k) in sides.iteritems():
+                if b!=(a+1)%n:
+                    # a diagonal
+                    ll,ee=sides[(b,a)]
+                    us.change_edge_gluing(lab,k,ll,ee)
+            for (lab,k),(ll,ee) in gluings:
+                us.change_edge_gluing(lab,k,ll,ee)
         return s
     
     def _edge_needs_flip(self,p1,e1):
@@ -914,7 +948,122 @@ class SimilaritySurface(SageObject):
         from sage.functions.generalized import sgn
         return sim[1][0]==0
     
+    def delaunay_flip_edges(self, edges=None, flip_callback=None):
+        r"""
+        Flip edges of this triangulated surface until it is Delaunay
+        triangulated. The surface must be mutable and is changed in place.
+        The number of flips performed is returned.
+
+        The edges to be examined are kept in a worklist. After a flip only the
+        four edges of the quadrilateral containing the flipped edge are put
+        back into the worklist, so that the surface is never rescanned.
+        Among the edges of the worklist, the first one for the order of
+        :meth:`label_iterator` at the start of the call (and then of the edge
+        indices) is processed first, so that the result is deterministic.
+
+        INPUT:
+
+        - ``edges`` -- an optional iterable of pairs (label, edge) to be
+          examined initially. By default all the edges are examined. Only use
+          this if the edges not listed are known to be Delaunay.
+
+        - ``flip_callback`` -- an optional function which is called with the
+          arguments ``(label, edge)`` just before the edge is flipped
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: s0=translation_surfaces.octagon_and_squares()
+            sage: a=s0.base_ring().gens()[0]
+            sage: m=Matrix([[1,2+a],[0,1]])
+            sage: s=(m*s0).triangulate()
+            sage: flips = []
+            sage: n = s.delaunay_flip_edges(flip_callback=lambda l,e: flips.append((l,e)))
+            sage: n > 0 and n == len(flips)
+            True
+            sage: s.delaunay_flip_edges()
+            0
+            sage: TestSuite(s).run()
+        """
+        if not self.is_mutable():
+            raise ValueError("the surface must be mutable")
+        from heapq import heappush, heappop
+        labels = list(self.label_iterator())
+        index = {l:i for i,l in enumerate(labels)}
+
+        def key(l,e):
+            # Key of the first of the two glued edges in edge_iterator order.
+            ll,ee = self.opposite_edge(l,e)
+            return min((index[l],e), (index[ll],ee))
+
+        queue = []
+        queued = set()
+        def push(l,e):
+            k = key(l,e)
+            if k not in queued:
+                queued.add(k)
+                heappush(queue, k)
+
+        if edges is None:
+            for l in labels:
+                for e in xrange(self.polygon(l).num_edges()):
+                    push(l,e)
+        else:
+            for l,e in edges:
+                push(l,e)
+
+        count = 0
+        while queue:
+            k = heappop(queue)
+            queued.discard(k)
+            l,e = labels[k[0]], k[1]
+            if key(l,e) != k:
+                # The gluing of this edge changed since it was added. The
+                # edge has been put back into the worklist under its new key.
+                continue
+            if not self._edge_needs_flip(l,e):
+                continue
+            ll,ee = self.opposite_edge(l,e)
+            if flip_callback is not None:
+                flip_callback(l,e)
+            self.triangle_flip(l, e, in_place=True)
+            count += 1
+            # The flipped edge is now (l,0) glued to (ll,0) and the sides of
+            # the quadrilateral are the edges 1 and 2 of the two triangles.
+            push(l,1)
+            push(l,2)
+            if ll != l:
+                push(ll,1)
+                push(ll,2)
+        return count
+
     def delaunay_triangulation(self, triangulated=False, in_place=False):
+        r"""
+        Return a Delaunay triangulation of this surface.
+
+        See :meth:`delaunay_flip_edges` for the flip algorithm used. The
+        number of flips is not returned. To get it, call
+        :meth:`delaunay_flip_edges` on a mutable triangulation.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: s0=translation_surfaces.octagon_and_squares()
+            sage: a=s0.base_ring().gens()[0]
+            sage: m=Matrix([[1,2+a],[0,1]])
+            sage: s=(m*s0).delaunay_triangulation()
+            sage: all(not s._edge_needs_flip(l,e) for (l,e) in s.edge_iterator())
+            True
+            sage: TestSuite(s).run()
+
+        Counting the flips::
+
+            sage: t=(m*s0).triangulate()
+            sage: t.delaunay_flip_edges() > 0
+            True
+            sage: t.delaunay_flip_edges()
+            0
+        """
         if not self.is_finite():
             raise NotImplementedError("Not implemented for infinite surfaces.")
         if triangulated:
@@ -926,16 +1075,131 @@ class SimilaritySurface(SageObject):
         else:
             from flatsurf.geometry.surface import Surface_fast
             s=self.__class__(Surface_fast(self.triangulate(in_place=in_place),mutable=True))
-        loop=True
-        while loop:
-            loop=False
-            for (l1,e1),(l2,e2) in s.edge_iterator(gluings=True):
-                if (l1<l2 or (l1==l2 and e1<=e2)) and s._edge_needs_flip(l1,e1):
-                    s.triangle_flip(l1, e1, in_place=True)
-                    loop=True
-                    break
+        s.delaunay_flip_edges()
         return s
     
+    def _join_delaunay_cells(self):
+        r"""
+        Join the triangles of this mutable Delaunay triangulated surface into
+        the cells of its Delaunay decomposition. The surface is changed in
+        place.
+
+        The triangles are grouped into cells with a union-find structure over
+        the edges which need to be joined, and each cell is then replaced by
+        its convex polygon in one step. As with repeated calls to
+        :meth:`join_polygons`, each cell keeps the smallest label of its
+        triangles and the first vertex of the corresponding triangle.
+
+        Return a dictionary sending the label of each cell to the list of
+        pairs ``(label, similarity)``, one for each triangle making up the
+        cell, where the similarity sends the coordinates of the triangle to
+        the coordinates of the cell.
+        """
+        labels = list(self.label_iterator())
+        parent = {l:l for l in labels}
+        def find(l):
+            root = l
+            while parent[root] != root:
+                root = parent[root]
+            while parent[l] != root:
+                parent[l], l = root, parent[l]
+            return root
+
+        # Edges in the interior of a cell
+        interior = set()
+        for l in labels:
+            for e in xrange(3):
+                if (l,e) in interior:
+                    continue
+                ll,ee = self.opposite_edge(l,e)
+                if (ll,ee) in interior or not self._edge_needs_join(l,e):
+                    continue
+                r1 = find(l)
+                r2 = find(ll)
+                if r1 == r2:
+                    raise ValueError("Can't glue polygon to itself.")
+                if r2 < r1:
+                    r1,r2 = r2,r1
+                parent[r2] = r1
+                interior.add((l,e))
+                interior.add((ll,ee))
+
+        # Similarities from the triangles to the cells
+        G = SimilarityGroup(self.base_ring())
+        cells = {}
+        for l in labels:
+            root = find(l)
+            if root != l:
+                continue
+            frames = {l: G.one()}
+            stack = [l]
+            while stack:
+                t = stack.pop()
+                for e in xrange(3):
+                    if (t,e) in interior:
+                        tt,ee = self.opposite_edge(t,e)
+                        if tt not in frames:
+                            frames[tt] = frames[t]*self.edge_transformation(tt,ee)
+                            stack.append(tt)
+            cells[l] = list(frames.iteritems())
+
+        def outgoing_boundary_edge(t,e):
+            # Turn clockwise around the first vertex of the edge (t,e) until
+            # an edge on the boundary of the cell is found.
+            while (t,e) in interior:
+                t,e = self.opposite_edge(t,e)
+                e = (e+1)%3
+            return t,e
+
+        P = Polygons(self.base_ring())
+        position = {}
+        boundaries = {}
+        new_polygons = {}
+        for root, cell in cells.iteritems():
+            if len(cell) == 1:
+                continue
+            frames = dict(cell)
+            start = outgoing_boundary_edge(root,0)
+            t,e = start
+            boundary = []
+            edges = []
+            while True:
+                position[(t,e)] = (root,len(boundary))
+                boundary.append((t,e))
+                edges.append(frames[t].derivative()*self.polygon(t).edge(e))
+                t,e = outgoing_boundary_edge(t,(e+1)%3)
+                if (t,e) == start:
+                    break
+            boundaries[root] = boundary
+            new_polygons[root] = P(edges)
+
+        if not new_polygons:
+            return cells
+
+        s = self.underlying_surface()
+        gluings = {}
+        for root, boundary in boundaries.iteritems():
+            glue = []
+            for t,e in boundary:
+                edge = self.opposite_edge(t,e)
+                glue.append(position.get(edge, edge))
+            gluings[root] = glue
+        for root, cell in cells.iteritems():
+            for t,g in cell:
+                if t != root:
+                    s.remove_polygon(t)
+        # The gluings are only set once all the cells have the right number
+        # of edges.
+        for root, polygon in new_polygons.iteritems():
+            s.change_polygon(root, polygon)
+        for root, glue in gluings.iteritems():
+            for e, (ll,ee) in enumerate(glue):
+                s.change_edge_gluing(root, e, ll, ee)
+        base_label = find(s.base_label())
+        if base_label != s.base_label():
+            s.change_base_label(base_label)
+        return cells
+
     def delaunay_decomposition(self, triangulated=False, \
             delaunay_triangulated=False, in_place=False):
         r"""
@@ -985,14 +1249,7 @@ class SimilaritySurface(SageObject):
         if not delaunay_triangulated:
             s=s.delaunay_triangulation(triangulated=triangulated,in_place=True)
         # Now s is the Delaunay Triangulated
-        loop=True
-        while loop:
-            loop=False
-            for (l1,e1),(l2,e2) in s.edge_iterator(gluings=True):
-                if (l1<l2 or (l1==l2 and e1<=e2)) and s._edge_needs_join(l1,e1):
-                    s.join_polygons(l1, e1, in_place=True)
-                    loop=True
-                    break
+        s._join_delaunay_cells()
         return s
     
     def graphical_surface(self, *args, **kwds):
@@ -1164,16 +1421,23 @@ class SimilaritySurface(SageObject):
         if not other.is_finite():
             raise ValueError("Can not compare infinite surfaces.")
         if not self.is_mutable() and not other.is_mutable():
+            # Both the hash and the fingerprint are cached.
             hash1 = hash(self)
             hash2 = hash(other)
             if hash1 != hash2:
                 return False
-        if self.base_ring() != other.base_ring():
+            if self.base_ring() != other.base_ring():
+                return False
+            if self.fingerprint() != other.fingerprint():
+                return False
+        elif self.base_ring() != other.base_ring():
             return False
         if self.base_label() != other.base_label():
             return False
         if self.num_polygons() != other.num_polygons():
             return False
+        if self.num_edges() != other.num_edges():
+            return False
         for label,polygon in self.label_iterator(polygons=True):
             try:
                 polygon2 = other.polygon(label)
@@ -1192,15 +1456,68 @@ class SimilaritySurface(SageObject):
     def __hash__(self):
         r"""
         Hash compatible with equals.
+
+        The hash is cached in the underlying surface.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: s = translation_surfaces.octagon_and_squares()
+            sage: hash(s) == hash(s)
+            True
+            sage: hash(s) == hash(translation_surfaces.octagon_and_squares())
+            True
+            sage: hash(s.mutable_copy())
+            Traceback (most recent call last):
+            ...
+            ValueError: Attempting to hash with mutable underlying surface.
         """
         if self._s.is_mutable():
             raise ValueError("Attempting to hash with mutable underlying surface.")
+        try:
+            return self._s._cache["hash"]
+        except KeyError:
+            pass
         h = 17*hash(self.base_ring())+23*hash(self.base_label())
         for pair in self.label_iterator(polygons=True):
             h = h + 7*hash(pair)
         for edgepair in self.edge_iterator(gluings=True):
             h = h + 3*hash(edgepair)
+        self._s._cache["hash"] = h
         return h
 
+    def fingerprint(self):
+        r"""
+        Return a tuple of invariants which does not depend on the labels of
+        the polygons: the number of polygons, the number of edges, the area
+        and the sorted hashes of the polygons.
+
+        Surfaces which are equal have the same fingerprint. The fingerprint is
+        cached when the underlying surface is immutable.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: s = translation_surfaces.octagon_and_squares()
+            sage: f = s.fingerprint()
+            sage: f[:2]
+            (3, 16)
+            sage: s.mutable_copy(dictionary=False).fingerprint() == f
+            True
+            sage: s.triangulate().fingerprint() == f
+            False
+        """
+        try:
+            return self._s._cache["fingerprint"]
+        except KeyError:
+            pass
+        if not self.is_finite():
+            raise NotImplementedError("fingerprint is only implemented for finite surfaces")
+        f = (self.num_polygons(), self.num_edges(), self._s.area(),
+            tuple(sorted(hash(p) for l,p in self.label_iterator(polygons=True))))
+        if not self._s.is_mutable():
+            self._s._cache["fingerprint"] = f
+        return f
+
 
 
@@ -1,3 +1,5 @@
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import deque, defaultdict
 
 from flatsurf.geometry.tangent_bundle import *
@@ -49,6 +51,72 @@ def get_linearity_coeff(u, v):
     else:
         raise ValueError("zero vector")
 
+def find_cycle(step, x0, key=None, max_steps=None):
+    r"""
+    Find the cycle of the sequence ``x0, step(x0), step(step(x0)), ...`` with
+    Brent's algorithm.
+
+    Return a pair ``(preperiod, period)`` or ``None`` if ``step`` returned
+    ``None`` (e.g. a singularity was reached) or if no cycle was found with
+    ``max_steps`` evaluations of ``step``. Only a bounded number of states are
+    kept in memory.
+
+    INPUT:
+
+    - ``step`` -- a function returning the next state or ``None``
+
+    - ``x0`` -- the initial state
+
+    - ``key`` -- an optional function used to compare states (by default the
+      states are compared directly)
+
+    - ``max_steps`` -- an optional bound on the number of steps
+
+    EXAMPLES::
+
+        sage: from flatsurf.geometry.straight_line_trajectory import find_cycle
+        sage: find_cycle(lambda x: (x*x+1) % 255, 3)
+        (2, 6)
+        sage: find_cycle(lambda x: x+1, 0, max_steps=100) is None
+        True
+        sage: find_cycle(lambda x: x-1 if x else None, 10) is None
+        True
+    """
+    if key is None:
+        key = lambda x: x
+    # find the period
+    power = period = 1
+    n = 1
+    tortoise = x0
+    hare = step(x0)
+    if hare is None:
+        return None
+    k = key(tortoise)
+    while k != key(hare):
+        if power == period:
+            tortoise = hare
+            k = key(tortoise)
+            power *= 2
+            period = 0
+        if max_steps is not None and n >= max_steps:
+            return None
+        hare = step(hare)
+        if hare is None:
+            return None
+        n += 1
+        period += 1
+
+    # find the preperiod
+    tortoise = hare = x0
+    for i in range(period):
+        hare = step(hare)
+    preperiod = 0
+    while key(tortoise) != key(hare):
+        tortoise = step(tortoise)
+        hare = step(hare)
+        preperiod += 1
+    return (preperiod, period)
+
 class SegmentInPolygon:
     r"""
     Maximal segment in a polygon of a similarity surface
@@ -187,6 +255,113 @@ class SegmentInPolygon:
         deprecation(1, "do not use end_direction but end().vector()")
         return self._end.vector()
 
+def segment_iterator(tangent_vector, steps=None, callbacks=()):
+    r"""
+    Iterate over the segments of the forward straight-line trajectory of
+    ``tangent_vector`` without storing them.
+
+    The iteration stops after ``steps`` segments (if provided), when a
+    singularity is reached or when the trajectory closes up. Each of the
+    ``callbacks`` is called with each segment before it is yielded.
+
+    See :meth:`~flatsurf.geometry.tangent_bundle.SimilaritySurfaceTangentVector.straight_line_segment_iterator`.
+    """
+    seg = SegmentInPolygon(tangent_vector)
+    initial = seg.start()
+    n = 0
+    while True:
+        for callback in callbacks:
+            callback(seg)
+        yield seg
+        n += 1
+        if steps is not None and n >= steps:
+            return
+        end = seg.end()
+        if end.is_based_at_singularity():
+            return
+        forward = end.invert()
+        if forward.differs_by_scaling(initial):
+            return
+        seg = SegmentInPolygon(forward)
+
+class VisitCounter(object):
+    r"""
+    Callback for :func:`segment_iterator` that counts the number of segments
+    in each polygon.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.straight_line_trajectory import VisitCounter
+        sage: t = translation_surfaces.square_torus()
+        sage: v = t.tangent_vector(0, (1/5,1/7), (13,17))
+        sage: visits = VisitCounter()
+        sage: for seg in v.straight_line_segment_iterator(100, [visits]):
+        ....:     pass
+        sage: visits.total
+        30
+        sage: dict(visits.counts)
+        {0: 30}
+    """
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.total = 0
+
+    def __call__(self, segment):
+        self.counts[segment.polygon_label()] += 1
+        self.total += 1
+
+class CodingRecorder(object):
+    r"""
+    Callback for :func:`segment_iterator` that records the edges through which
+    the segments leave their polygon.
+
+    INPUT:
+
+    - ``alphabet`` -- an optional dictionary ``(lab,nb) -> letter``. If some
+      labels are avoided then these crossings are ignored.
+
+    - ``out`` -- an optional object with a ``write`` method (e.g. a file) to
+      which the letters are written instead of being stored in the attribute
+      ``coding``. In that case the letters must be strings.
+    """
+    def __init__(self, alphabet=None, out=None):
+        self._alphabet = alphabet
+        self._out = out
+        self.coding = []
+
+    def __call__(self, segment):
+        pos = segment.end()._position
+        if pos._position_type != pos.EDGE_INTERIOR:
+            return
+        e = (segment.polygon_label(), pos.get_edge())
+        lab = e if self._alphabet is None else self._alphabet.get(e)
+        if lab is None:
+            return
+        if self._out is None:
+            self.coding.append(lab)
+        else:
+            self._out.write(lab)
+
+class ClosureDetector(object):
+    r"""
+    Callback for :func:`segment_iterator` that detects whether the trajectory
+    closes up.
+
+    After the iteration, the attribute ``closed`` is ``True`` if the last
+    segment ends at the starting point of the first one.
+    """
+    def __init__(self):
+        self._initial = None
+        self.closed = False
+
+    def __call__(self, segment):
+        if self._initial is None:
+            self._initial = segment.start()
+        end = segment.end()
+        self.closed = not end.is_based_at_singularity() and \
+            end.invert().differs_by_scaling(self._initial)
+
 class AbstractStraightLineTrajectory:
     r"""
     You need to implement:
@@ -273,7 +448,9 @@ class AbstractStraightLineTrajectory:
         """
         ans = []
 
-        s = self._segments[0]
+        n = self.combinatorial_length()
+
+        s = self.segment(0)
         start = s.start()
         if start._position._position_type == start._position.EDGE_INTERIOR:
             p = s.polygon_label()
@@ -282,8 +459,8 @@ class AbstractStraightLineTrajectory:
             if lab is not None:
                 ans.append(lab)
 
-        for i in range(len(self._segments)-1):
-            s = self._segments[i]
+        for i in range(n-1):
+            s = self.segment(i)
             end = s.end()
             p = s.polygon_label()
             e = end._position.get_edge()
@@ -291,7 +468,7 @@ class AbstractStraightLineTrajectory:
             if lab is not None:
                 ans.append(lab)
 
-        s = self._segments[-1]
+        s = self.segment(n-1)
         end = s.end()
         if end._position._position_type == end._position.EDGE_INTERIOR and \
            end.invert() != start:
@@ -306,14 +483,67 @@ class AbstractStraightLineTrajectory:
 class StraightLineTrajectory(AbstractStraightLineTrajectory):
     r"""
     Straight-line trajectory in a similarity surface.
+
+    The trajectory only stores, for each segment, the label of its polygon,
+    the position of its starting point on the boundary of the polygon (as an
+    edge number and a coefficient along this edge) and its direction. The
+    segments are built on demand by :meth:`segment`.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: s = similarity_surfaces.example()
+        sage: v = s.tangent_vector(0, (1,-1/2), (3,-1))
+        sage: L = v.straight_line_trajectory()
+        sage: L.flow(5); L.flow(-5)
+        sage: segs = L.segments()
+        sage: len(segs) == L.combinatorial_length()
+        True
+        sage: all(segs[i].next() == segs[i+1] for i in range(len(segs)-1))
+        True
     """
     def __init__(self, tangent_vector):
-        self._segments = deque()
+        self._s = tangent_vector.surface()
+        self._labels = deque()
+        self._edges = deque()
+        self._params = deque()
+        self._vectors = deque()
         seg = SegmentInPolygon(tangent_vector)
-        self._segments.append(seg)
+        self._append(seg.start())
+        self._initial = seg.start()
+        self._terminal = seg.end()
         self._setup_forward()
         self._setup_backward()
 
+    def _encode(self, start):
+        r"""
+        Return the triple ``(edge, coefficient, vector)`` describing the
+        tangent vector ``start`` based on the boundary of its polygon.
+        """
+        pos = start.position()
+        poly = start.polygon()
+        if pos.is_vertex():
+            e = pos.get_vertex()
+            t = self._s.base_ring().zero()
+        else:
+            e = pos.get_edge()
+            t = get_linearity_coeff(poly.edge(e), start.point() - poly.vertex(e))
+        return e, t, start.vector()
+
+    def _append(self, start):
+        e, t, v = self._encode(start)
+        self._labels.append(start.polygon_label())
+        self._edges.append(e)
+        self._params.append(t)
+        self._vectors.append(v)
+
+    def _appendleft(self, start):
+        e, t, v = self._encode(start)
+        self._labels.appendleft(start.polygon_label())
+        self._edges.appendleft(e)
+        self._params.appendleft(t)
+        self._vectors.appendleft(v)
+
     def segment(self, i):
         r"""
         EXAMPLES::
@@ -335,13 +565,30 @@ class StraightLineTrajectory(AbstractStraightLineTrajectory):
             Segment in polygon 0 starting at (-1/13*a, 1/13*a) and ending at
             (9/26*a + 11/13, 17/26*a + 15/13)
         """
-        return self.segments()[i]
+        n = len(self._labels)
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError("segment index out of range")
+        if i == 0:
+            start = self._initial
+        else:
+            lab = self._labels[i]
+            poly = self._s.polygon(lab)
+            e = self._edges[i]
+            point = poly.vertex(e) + self._params[i] * poly.edge(e)
+            start = self._s.tangent_vector(lab, point, self._vectors[i])
+        if i == n-1:
+            end = self._terminal
+        else:
+            end = start.forward_to_polygon_boundary()
+        return SegmentInPolygon(start, end)
 
     def combinatorial_length(self):
-        return len(self.segments())
+        return len(self._labels)
 
     def segments(self):
-        return self._segments
+        return [self.segment(i) for i in range(len(self._labels))]
 
     def _setup_forward(self):
         v = self.terminal_tangent_vector()
@@ -358,10 +605,10 @@ class StraightLineTrajectory(AbstractStraightLineTrajectory):
             self._backward = v.invert()
 
     def initial_tangent_vector(self):
-        return self._segments[0].start()
+        return self._initial
 
     def terminal_tangent_vector(self):
-        return self._segments[-1].end()
+        return self._terminal
 
     def is_forward_separatrix(self):
         return self._forward is None
@@ -413,6 +660,47 @@ class StraightLineTrajectory(AbstractStraightLineTrajectory):
         return (not self.is_forward_separatrix()) and \
             self._forward.differs_by_scaling(self.initial_tangent_vector())
 
+    def _state(self, start):
+        r"""
+        Return a hashable description of the segment starting at the tangent
+        vector ``start``, where the direction is only considered up to
+        scaling.
+        """
+        e, t, v = self._encode(start)
+        x = abs(v[0]) if v[0] else abs(v[1])
+        return (start.polygon_label(), e, t, v[0]/x, v[1]/x)
+
+    def find_cycle(self, max_steps=None):
+        r"""
+        Look for a cycle in the forward trajectory.
+
+        Return a pair ``(preperiod, period)`` such that the segments number
+        ``preperiod`` and ``preperiod + period`` (counted from the first
+        segment of the trajectory) coincide up to scaling of their
+        direction, or ``None`` if the trajectory reaches a singularity or
+        if no cycle was found in ``max_steps`` steps. The trajectory itself
+        is not modified.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: t = translation_surfaces.square_torus()
+            sage: v = t.tangent_vector(0, (1/5,1/7), (13,17))
+            sage: L = v.straight_line_trajectory()
+            sage: L.find_cycle()
+            (0, 30)
+            sage: v = t.tangent_vector(0, (0,0), (13,17))
+            sage: L = v.straight_line_trajectory()
+            sage: L.find_cycle() is None
+            True
+        """
+        def step(start):
+            end = start.forward_to_polygon_boundary()
+            if end.is_based_at_singularity():
+                return None
+            return end.invert()
+        return find_cycle(step, self._initial, key=self._state, max_steps=max_steps)
+
     def flow(self, steps):
         r"""
         Append or preprend segments to the trajectory.
@@ -439,13 +727,15 @@ class StraightLineTrajectory(AbstractStraightLineTrajectory):
         while steps>0 and \
             (not self.is_forward_separatrix()) and \
             (not self.is_closed()):
-                self._segments.append(SegmentInPolygon(self._forward))
+                self._append(self._forward)
+                self._terminal = self._forward.forward_to_polygon_boundary()
                 self._setup_forward()
                 steps -= 1
         while steps<0 and \
             (not self.is_backward_separatrix()) and \
             (not self.is_closed()):
-                self._segments.appendleft(SegmentInPolygon(self._backward).invert())
+                self._initial = self._backward.forward_to_polygon_boundary()
+                self._appendleft(self._initial)
                 self._setup_backward()
                 steps += 1
 
@@ -454,12 +744,12 @@ class StraightLineTrajectory(AbstractStraightLineTrajectory):
     def initial_segment(self):
         from sage.misc.superseded import deprecation
         deprecation(-1, "initial_segment is deprecated... use self.segments()[0]")
-        return self._segments[0]
+        return self.segment(0)
 
     def terminal_segment(self):
         from sage.misc.superseded import deprecation
         deprecation(-1, "terminal_segment is deprecated... use self.segments()[0]")
-        return self._segments[-1]
+        return self.segment(-1)
 
 class StraightLineTrajectoryTranslation(AbstractStraightLineTrajectory):
     r"""
@@ -487,6 +777,14 @@ class StraightLineTrajectoryTranslation(AbstractStraightLineTrajectory):
         t = tangent_vector.polygon_label()
         self._vector = tangent_vector.vector()
         self._s = tangent_vector.surface()
+        if self._s.is_finite() and hasattr(self._s, "_flow_data"):
+            # flow maps shared by all the trajectories in the same direction
+            # and computed only for the visited polygons
+            data = self._s._flow_data(self._vector)
+            self._flow_direction = data["direction"]
+            self._flow_maps = data["flow_maps"]
+        else:
+            self._flow_maps = None
 
         start = SegmentInPolygon(tangent_vector).start()
         pos = start._position
@@ -545,7 +843,38 @@ class StraightLineTrajectoryTranslation(AbstractStraightLineTrajectory):
     def combinatorial_length(self):
         return len(self._points)
 
+    def find_cycle(self, max_steps=None):
+        r"""
+        Look for a cycle in the forward trajectory.
+
+        Return a pair ``(preperiod, period)`` such that the points number
+        ``preperiod`` and ``preperiod + period`` (counted from the first
+        point of the trajectory) coincide, or ``None`` if the trajectory
+        reaches a singularity or if no cycle was found in ``max_steps``
+        steps. The trajectory itself is not modified.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: from flatsurf.geometry.straight_line_trajectory import StraightLineTrajectoryTranslation
+            sage: t = translation_surfaces.square_torus()
+            sage: v = t.tangent_vector(0, (1/5,1/7), (13,17))
+            sage: L = StraightLineTrajectoryTranslation(v)
+            sage: L.find_cycle()
+            (0, 30)
+        """
+        def step(t):
+            t = self._next(*t)
+            return None if t[2].is_zero() else t
+        return find_cycle(step, self._points[0], max_steps=max_steps)
+
     def _get_iet(self, label):
+        if self._flow_maps is not None:
+            try:
+                return self._flow_maps[label]
+            except KeyError:
+                fm = self._flow_maps[label] = self._s.polygon(label).flow_map(self._flow_direction)
+                return fm
         polygon = self._s.polygon(label)
         try:
             return self._iets[polygon]
@@ -577,7 +906,13 @@ class StraightLineTrajectoryTranslation(AbstractStraightLineTrajectory):
             Segment in polygon 0 starting at (-1/13*a, 1/13*a) and ending at
             (9/26*a + 11/13, 17/26*a + 15/13)
         """
-        lab, e0, x0 = self._points[i]
+        return self._segment(*self._points[i])
+
+    def _segment(self, lab, e0, x0):
+        r"""
+        Return the segment starting at the point ``x0`` of the edge ``e0`` of
+        the polygon ``lab``.
+        """
         iet = self._get_iet(lab)
         e1, x1 = iet.forward_image(e0, x0)
         poly = self._s.polygon(lab)
@@ -592,7 +927,7 @@ class StraightLineTrajectoryTranslation(AbstractStraightLineTrajectory):
         return SegmentInPolygon(v0,v1)
 
     def segments(self):
-        return [self.segment(i) for i in self.combinatorial_length()]
+        return [self.segment(i) for i in range(self.combinatorial_length())]
 
     def is_closed(self):
         return self._points[0] == self._next(*self._points[-1])
@@ -645,3 +980,244 @@ class StraightLineTrajectoryTranslation(AbstractStraightLineTrajectory):
                     # closed curve or backward separatrix
                     break
                 self._points.appendleft(t)
+
+class StraightLineTrajectoryFloat(StraightLineTrajectoryTranslation):
+    r"""
+    Straight line trajectory in a finite translation surface computed with
+    double precision floating point numbers.
+
+    The trajectory is followed on the transversal of the interval exchange
+    :class:`~flatsurf.geometry.interval_exchange_transformation.FlowIET`
+    with floating point positions. Only the index of the interval crossed at
+    each step is stored. Since the exact position of the current point is
+    the initial position plus an integral combination of the exact
+    translations of the intervals, it can be recovered at any time. This is
+    done whenever the floating point position gets within ``tolerance``
+    (relatively to the length of the transversal) of a discontinuity, that
+    is whenever the trajectory passes close to a vertex, and every
+    ``resync`` steps to get rid of the accumulated rounding errors. In
+    particular, separatrices, saddle connections and closed trajectories are
+    detected exactly.
+
+    Only forward flow is supported.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: O = translation_surfaces.regular_octagon()
+        sage: v = O.tangent_vector(0, (1,1), (33,45))
+        sage: L = v.straight_line_trajectory()
+        sage: F = v.straight_line_trajectory(floating=True)
+        sage: L.flow(100); F.flow(100)
+        sage: F.combinatorial_length() == L.combinatorial_length()
+        True
+        sage: F.segments() == L.segments()
+        True
+        sage: F.coding() == L.coding()
+        True
+
+    Saddle connections are still recognized::
+
+        sage: t = translation_surfaces.square_torus()
+        sage: v = t.tangent_vector(0, (0,0), (13,17))
+        sage: F = v.straight_line_trajectory(floating=True)
+        sage: F.flow(1000)
+        sage: F.combinatorial_length()
+        30
+        sage: F.is_saddle_connection()
+        True
+
+    And so are closed trajectories::
+
+        sage: v = t.tangent_vector(0, (1/5,1/7), (13,17))
+        sage: F = v.straight_line_trajectory(floating=True)
+        sage: F.flow(1000)
+        sage: F.combinatorial_length()
+        30
+        sage: F.is_closed()
+        True
+
+    The segments are the ones of the exact trajectory::
+
+        sage: L = v.straight_line_trajectory()
+        sage: L.flow(1000)
+        sage: F.segment(0) == L.segment(0) and F.segment(-1) == L.segment(-1)
+        True
+        sage: F.segments() == L.segments()
+        True
+        sage: F
+        Straight line trajectory made of 30 segments from (54/595, 0) in polygon 0 to (54/595, 1) in polygon 0
+        sage: repr(F) == repr(L)
+        True
+    """
+    def __init__(self, tangent_vector, tolerance=1e-9, resync=4096):
+        self._vector = tangent_vector.vector()
+        self._s = tangent_vector.surface()
+        # the flow maps used by _get_iet are the ones of the interval exchange
+        data = self._s._flow_data(self._vector)
+        self._flow_direction = data["direction"]
+        self._flow_maps = data["flow_maps"]
+        self._flow_iet = T = self._s.flow_iet(self._vector)
+        lab, e, x = T.edge_coordinates(tangent_vector.polygon_label(), tangent_vector.point())
+        self._x0 = T.position(lab, e, x)
+        self._x = float(self._x0)
+        self._tolerance = tolerance * float(T.length())
+        self._resync = resync
+        self._since_resync = 0
+        self._counts = [0] * T.num_intervals()
+        self._atoms = array('i')
+        self._closed = False
+        self._singular = False
+
+    def _exact_position(self):
+        r"""
+        Return the exact position of the current point on the transversal.
+        """
+        shifts = self._flow_iet._shifts
+        x = self._x0
+        for k,c in enumerate(self._counts):
+            if c:
+                x += c * shifts[k]
+        return x
+
+    def _exact_step(self, x):
+        r"""
+        Return the interval containing ``x`` and the image of ``x``.
+        """
+        T = self._flow_iet
+        k = bisect_right(T._starts, x, 1, len(T._shifts)) - 1
+        return k, x + T._shifts[k]
+
+    def _is_singular(self, x):
+        r"""
+        Return whether the position ``x`` of the transversal is a vertex.
+        """
+        starts = self._flow_iet._edge_starts
+        i = bisect_left(starts, x)
+        return i < len(starts) and starts[i] == x
+
+    def flow(self, steps):
+        r"""
+        Append ``steps`` segments to the trajectory (or less if it closes up
+        or hits a singularity).
+        """
+        if steps < 0:
+            raise NotImplementedError("only forward flow is available with floating point arithmetic")
+        if self._closed or self._singular:
+            return
+        T = self._flow_iet
+        starts, shifts = T.float_arrays()
+        m = len(shifts)
+        tol = self._tolerance
+        resync = self._resync
+        since = self._since_resync
+        atoms = self._atoms
+        counts = self._counts
+        x0 = float(self._x0)
+        x = self._x
+        for i in xrange(steps):
+            k = bisect_right(starts, x, 1, m) - 1
+            if x - starts[k] < tol or starts[k+1] - x < tol or since >= resync:
+                # exact step
+                k, y = self._exact_step(self._exact_position())
+                if self._is_singular(y):
+                    self._singular = True
+                    break
+                if y == self._x0:
+                    self._closed = True
+                    break
+                y = float(y)
+                since = 0
+            else:
+                y = x + shifts[k]
+                since += 1
+                if abs(y - x0) < tol:
+                    y = self._exact_position() + T._shifts[k]
+                    if y == self._x0:
+                        self._closed = True
+                        break
+                    y = float(y)
+            atoms.append(k)
+            counts[k] += 1
+            x = y
+        self._x = x
+        self._since_resync = since
+
+    def combinatorial_length(self):
+        return len(self._atoms) + 1
+
+    def _exact_positions(self):
+        r"""
+        Iterate over the exact positions of the points of the trajectory.
+        """
+        shifts = self._flow_iet._shifts
+        x = self._x0
+        yield x
+        for k in self._atoms:
+            x += shifts[k]
+            yield x
+
+    def segment(self, i):
+        r"""
+        Return the ``i``-th segment.
+
+        This costs a number of additions proportional to ``i``.
+        """
+        n = self.combinatorial_length()
+        if i < 0:
+            i += n
+        if i < 0 or i >= n:
+            raise IndexError("segment index out of range")
+        if i == n-1:
+            x = self._exact_position()
+        else:
+            shifts = self._flow_iet._shifts
+            x = self._x0
+            for k in self._atoms[:i]:
+                x += shifts[k]
+        return self._segment(*self._flow_iet.edge_point(x))
+
+    def segments(self):
+        T = self._flow_iet
+        return [self._segment(*T.edge_point(x)) for x in self._exact_positions()]
+
+    def _next_position(self):
+        return self._exact_step(self._exact_position())[1]
+
+    def is_closed(self):
+        return self._closed or self._next_position() == self._x0
+
+    def is_forward_separatrix(self):
+        return self._singular or self._is_singular(self._next_position())
+
+    def is_backward_separatrix(self):
+        return self._is_singular(self._x0)
+
+    def coding(self, alphabet=None):
+        r"""
+        Return the coding of this trajectory with respect to the sides of the
+        polygons (see :meth:`AbstractStraightLineTrajectory.coding`).
+        """
+        T = self._flow_iet
+        edges = []
+        if not self.is_backward_separatrix():
+            lab, e, x = T.edge_point(self._x0)
+            edges.append((lab,e))
+        edges.extend(T.exit_edge(k) for k in self._atoms)
+        if not self.is_forward_separatrix() and not self.is_closed():
+            edges.append(T.exit_edge(self._exact_step(self._exact_position())[0]))
+        if alphabet is None:
+            return edges
+        return [alphabet[e] for e in edges if e in alphabet]
+
+    def find_cycle(self, max_steps=None):
+        r"""
+        Look for a cycle in the forward trajectory (see
+        :meth:`StraightLineTrajectoryTranslation.find_cycle`).
+
+        The computation is done with exact arithmetic on the transversal.
+        """
+        def step(x):
+            y = self._exact_step(x)[1]
+            return None if self._is_singular(y) else y
+        return find_cycle(step, self._x0, max_steps=max_steps)
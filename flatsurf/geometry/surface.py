@@ -36,6 +36,10 @@ class Surface(SageObject):
         self._mutable = mutable
         #self._cache=Surface.CachedData()
         self._cache = {}
+        # Number of mutations so far, and the value it had at the last
+        # mutation which changed the labels or the gluings.
+        self._version = 0
+        self._structure_version = 0
         
     # Do we really want to inherit from SageObject?
     
@@ -150,7 +154,8 @@ class Surface(SageObject):
         r"""
         Return the total number of edges of all polygons used.
         
-        Not cached. Will be likely be linear in the number of edges.
+        The first call is linear in the number of polygons. The result is
+        cached and kept up to date when the surface is mutated.
         """
         if self.is_finite():
             try:
@@ -167,7 +172,8 @@ class Surface(SageObject):
         r"""
         Return the area of this surface.
         
-        By default this method is not cached.
+        The first call is linear in the number of polygons. The result is
+        cached and kept up to date when the surface is mutated.
         """
         if self.is_finite():
             try:
@@ -213,22 +219,98 @@ class Surface(SageObject):
     def walker(self):
         r"""
         Return a LabelWalker which walks over the surface in a canonical way.
+
+        The walker is kept as long as the mutations of the surface do not
+        change its labels or its gluings.
         """
         try:
-            return self._cache["lw"]
+            lw, version = self._cache["lw"]
+            if version == self._structure_version:
+                return lw
         except KeyError:
-            lw = LabelWalker(self)
-            self._cache["lw"] = lw
-            return lw
+            pass
+        lw = LabelWalker(self)
+        self._cache["lw"] = (lw, self._structure_version)
+        return lw
 
-    def __mutate(self):
+    def version(self):
+        r"""
+        Return the number of mutations this surface went through.
+
+        This can be used to check whether data derived from a mutable
+        surface is still valid.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: s = translation_surfaces.octagon_and_squares().mutable_copy()
+            sage: us = s.underlying_surface()
+            sage: us.version()
+            0
+            sage: area = us.area()
+            sage: us.num_edges()
+            16
+            sage: lw = us.walker()
+            sage: us.change_polygon(0, us.polygon(0))
+            sage: us.version()
+            1
+            sage: us.walker() is lw
+            True
+            sage: s = s.triangulate(in_place=True)
+            sage: us.version() > 1
+            True
+            sage: us.num_edges()
+            30
+            sage: us.area() == area
+            True
+            sage: us.walker() is lw
+            False
+        """
+        return self._version
+
+    def __mutate(self, structural=True):
         r"""
         Called before a mutation occurs. Do not call directly.
+
+        If ``structural`` is ``False`` the mutation does not change the labels
+        nor the gluings of the surface.
         """
         assert(self.is_mutable())
-        # Remove the cache which will likely be invalidated.
+        self._version += 1
+        if structural:
+            self._structure_version = self._version
+        # Remove the cached data which is not updated along mutations.
         #self._cache=CachedData()
-        self._cache = {}
+        for key in list(self._cache):
+            if key not in ("num_edges", "area", "lw"):
+                del self._cache[key]
+
+    def __current_polygon(self, label):
+        r"""
+        Return the polygon with the provided label or None if the label is a
+        place holder obtained from ``add_polygon(None)``.
+        """
+        try:
+            return self.polygon(label)
+        except (TypeError, KeyError, IndexError):
+            return None
+
+    def __update_totals(self, removed_polygon, added_polygon):
+        r"""
+        Update the cached number of edges and area after removed_polygon was
+        replaced by added_polygon (any of them may be None).
+        """
+        cache = self._cache
+        if "num_edges" in cache:
+            if not removed_polygon is None:
+                cache["num_edges"] -= removed_polygon.num_edges()
+            if not added_polygon is None:
+                cache["num_edges"] += added_polygon.num_edges()
+        if "area" in cache:
+            if not removed_polygon is None:
+                cache["area"] -= removed_polygon.area()
+            if not added_polygon is None:
+                cache["area"] += added_polygon.area()
 
     def change_polygon(self, label, new_polygon, gluing_list=None):
         r"""
@@ -239,8 +321,11 @@ class Surface(SageObject):
         
         Warning: the gluing_list may be incorporated by reference.
         """
-        self.__mutate()
+        old_polygon = self.__current_polygon(label)
+        self.__mutate(gluing_list is not None or old_polygon is None or \
+            old_polygon.num_edges() != new_polygon.num_edges())
         assert gluing_list is None or new_polygon.num_edges() == len(gluing_list)
+        self.__update_totals(old_polygon, new_polygon)
         self._change_polygon(label, new_polygon, gluing_list)
 
     def change_edge_gluing(self, label1, edge1, label2, edge2):
@@ -262,13 +347,16 @@ class Surface(SageObject):
         """
         self.__mutate()
         assert gluing_list is None or new_polygon.num_edges() == len(gluing_list)
+        self.__update_totals(None, new_polygon)
         return self._add_polygon(new_polygon, gluing_list)
 
     def remove_polygon(self, label):
         r"""
         Remove the polygon with the provided label.
         """
+        old_polygon = self.__current_polygon(label)
         self.__mutate()
+        self.__update_totals(old_polygon, None)
         return self._remove_polygon(label)
 
     def change_base_label(self, new_base_label):
@@ -452,7 +540,7 @@ class Surface_fast(Surface):
                     yield i
             else:
                 # We've removed some labels
-                for i in xrange(self.num_polygons()):
+                for i in xrange(len(self._p)):
                     if not self._p[i] is None:
                         yield i
         else:
@@ -476,7 +564,7 @@ class Surface_fast(Surface):
                 for i in xrange(self.num_polygons()):
                     yield i,self._p[i][0]
             else:
-                for i in xrange(self.num_polygons()):
+                for i in xrange(len(self._p)):
                     if not self._p[i] is None:
                         yield i,self._p[i][0]
         else:
@@ -499,6 +587,325 @@ class Surface_fast(Surface):
             del self._p[label]
         self._num_polygons -= 1
 
+class Surface_compact(Surface):
+    r"""
+    A mutable implementation of surface designed for surfaces with many edges.
+
+    The labels are the integers 0, 1, ... The polygons are kept in a list and
+    each edge is given a global integer identifier. The gluings are stored in
+    flat integer arrays indexed by these identifiers (with -1 standing for an
+    unglued edge), so that no Python tuple is stored per edge.
+
+    EXAMPLES::
+
+        sage: from flatsurf import *
+        sage: from flatsurf.geometry.surface import Surface_compact
+        sage: s = translation_surfaces.octagon_and_squares()
+        sage: ss = s.__class__(Surface_compact(s))
+        sage: ss.is_mutable()
+        False
+        sage: ss == s
+        True
+        sage: TestSuite(ss).run()
+
+        sage: a = s.base_ring().gens()[0]
+        sage: ss = (Matrix([[1,2+a],[0,1]])*s).mutable_copy(compact=True)
+        sage: isinstance(ss.underlying_surface(), Surface_compact)
+        True
+        sage: ss = ss.triangulate(in_place=True)
+        sage: ss.num_polygons()
+        10
+        sage: TestSuite(ss).run()
+        sage: ss = ss.delaunay_decomposition(in_place=True)
+        sage: ss.num_polygons()
+        3
+        sage: TestSuite(ss).run()
+    """
+    def __init__(self, surface = None, base_ring=None, mutable=None):
+        from array import array
+        self._base_label = 0
+        self._polygons = []
+        # For each label, the global identifier of the edge 0 of the polygon
+        # (or -1 if there is no polygon with this label).
+        self._offsets = array('l')
+        # For each global edge identifier, the global identifier of the edge
+        # it is glued to (or -1) and the label of its polygon (or -1 if the
+        # edge is not in use anymore).
+        self._gluings = array('l')
+        self._edge_labels = array('l')
+        # Blocks of unused edges indexed by their size and the total number
+        # of unused edges (see _free_edges and _compact).
+        self._free_blocks = {}
+        self._num_free_edges = 0
+        self._num_polygons = 0
+        if surface is None:
+            if base_ring is None:
+                raise ValueError("Either surface or base_ring must be provided.")
+            self._base_ring = base_ring
+            if not mutable is None:
+                if not mutable:
+                    raise ValueError("If no surface is provided, then mutable must be true.")
+            Surface.__init__(self, mutable=True)
+        else:
+            from flatsurf.geometry.similarity_surface import SimilaritySurface
+            if isinstance(surface,SimilaritySurface):
+                surface=surface.underlying_surface()
+            if not isinstance(surface,Surface):
+                raise ValueError("surface must be either a Surface or SimilaritySurface")
+            if not base_ring is None:
+                raise ValueError("You currently can not provide both a surface and a base_ring.")
+            self._base_ring = surface.base_ring()
+            if not surface.is_finite():
+                raise ValueError("Can not copy an infinite surface.")
+            Surface.__init__(self, mutable=True)
+            label_dict = {}
+            for label,polygon in surface.label_polygon_iterator():
+                label_dict[label] = self._add_polygon(polygon)
+            self._base_label = label_dict[surface.base_label()]
+            for (l1,e1),(l2,e2) in surface.edge_gluing_iterator():
+                self._gluings[self._offsets[label_dict[l1]]+e1] = \
+                    self._offsets[label_dict[l2]]+e2
+            if mutable is None or not mutable:
+                self.make_immutable()
+
+    def base_ring(self):
+        r"""
+        The field on which the coordinates of ``self`` live.
+        """
+        return self._base_ring
+
+    def polygon(self, lab):
+        r"""
+        Return the polygon with label ``lab``.
+        """
+        return self._polygons[lab]
+
+    def base_label(self):
+        r"""
+        Always returns the same label.
+        """
+        return self._base_label
+
+    def opposite_edge(self, p, e):
+        r"""
+        Given the label ``p`` of a polygon and an edge ``e`` in that polygon
+        returns the pair (``pp``, ``ee``) to which this edge is glued.
+        """
+        g = self._gluings[self._offsets[p]+e]
+        if g < 0:
+            return None
+        pp = self._edge_labels[g]
+        return (pp, g-self._offsets[pp])
+
+    def is_finite(self):
+        r"""
+        Return whether or not the surface is finite.
+        """
+        return True
+
+    def num_polygons(self):
+        r""" 
+        Return the number of polygons making up the surface in constant time.
+        """
+        return self._num_polygons
+
+    def label_iterator(self):
+        r"""
+        Iterator over all polygon labels.
+        """
+        polygons = self._polygons
+        for i in xrange(len(polygons)):
+            if not polygons[i] is None:
+                yield i
+
+    def label_polygon_iterator(self):
+        r"""
+        Iterate over pairs (label,polygon).
+        """
+        polygons = self._polygons
+        for i in xrange(len(polygons)):
+            if not polygons[i] is None:
+                yield i,polygons[i]
+
+    # Methods for changing the surface
+
+    def _new_edges(self, label, n):
+        r"""
+        Allocate ``n`` unglued edges for the polygon with label ``label`` and
+        return the global identifier of the first one.
+
+        A block of ``n`` edges freed by :meth:`_free_edges` is reused if there
+        is one.
+        """
+        blocks = self._free_blocks.get(n)
+        if blocks:
+            offset = blocks.pop()
+            self._num_free_edges -= n
+            for g in xrange(offset, offset+n):
+                self._gluings[g] = -1
+                self._edge_labels[g] = label
+            return offset
+        offset = len(self._gluings)
+        self._gluings.extend([-1]*n)
+        self._edge_labels.extend([label]*n)
+        return offset
+
+    def _unglue(self, g):
+        r"""
+        Unglue the edge with global identifier ``g`` and the edge it is glued
+        to.
+        """
+        gluings = self._gluings
+        gg = gluings[g]
+        if gg >= 0 and gluings[gg] == g:
+            gluings[gg] = -1
+        gluings[g] = -1
+
+    def _free_edges(self, label):
+        r"""
+        Unglue the edges of the polygon with label ``label`` and mark them as
+        unused.
+
+        The freed block of edges is kept for reuse by :meth:`_new_edges`. When
+        more than half of the edges are unused the arrays are compacted.
+        """
+        offset = self._offsets[label]
+        if offset < 0:
+            return
+        n = self._polygons[label].num_edges()
+        for g in xrange(offset, offset+n):
+            self._unglue(g)
+            self._edge_labels[g] = -1
+        self._offsets[label] = -1
+        self._free_blocks.setdefault(n, []).append(offset)
+        self._num_free_edges += n
+        if 2*self._num_free_edges > len(self._gluings):
+            self._compact()
+
+    def _compact(self):
+        r"""
+        Renumber the edges in use so that the arrays have no unused edges.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: s = translation_surfaces.square_torus().mutable_copy(compact=True)
+            sage: t = s.underlying_surface()
+            sage: for i in range(10):
+            ....:     s = s.triangulate(in_place=True)
+            ....:     s = s.delaunay_decomposition(in_place=True)
+            sage: len(t._gluings) <= 2 * s.num_edges()
+            True
+            sage: TestSuite(s).run()
+        """
+        from array import array
+        gluings = self._gluings
+        offsets = self._offsets
+        new_ids = array('l', [-1]) * len(gluings)
+        new_gluings = array('l')
+        new_edge_labels = array('l')
+        for label, polygon in enumerate(self._polygons):
+            offset = offsets[label]
+            if polygon is None or offset < 0:
+                continue
+            n = polygon.num_edges()
+            new_offset = len(new_edge_labels)
+            for e in xrange(n):
+                new_ids[offset+e] = new_offset+e
+            new_edge_labels.extend([label]*n)
+            new_gluings.extend(gluings[offset:offset+n])
+            offsets[label] = new_offset
+        for g in xrange(len(new_gluings)):
+            gg = new_gluings[g]
+            if gg >= 0:
+                new_gluings[g] = new_ids[gg]
+        self._gluings = new_gluings
+        self._edge_labels = new_edge_labels
+        self._free_blocks = {}
+        self._num_free_edges = 0
+
+    def _change_polygon(self, label, new_polygon, gluing_list=None):
+        r"""
+        Internal method used by change_polygon(). Should not be called directly.
+
+        EXAMPLES:
+
+        An edge glued to ``None`` is unglued on both sides::
+
+            sage: from flatsurf.geometry.surface import Surface_compact
+            sage: from flatsurf.geometry.polygon import polygons
+            sage: s = Surface_compact(base_ring=QQ)
+            sage: s.add_polygon(polygons.square())
+            0
+            sage: s.add_polygon(polygons.square())
+            1
+            sage: s.change_edge_gluing(0, 1, 1, 3)
+            sage: s.change_polygon(0, polygons.square(), [None]*4)
+            sage: s.opposite_edge(1, 3) is None
+            True
+        """
+        old_polygon = self._polygons[label]
+        if old_polygon is None:
+            self._num_polygons += 1
+            self._offsets[label] = self._new_edges(label, new_polygon.num_edges())
+        elif old_polygon.num_edges() != new_polygon.num_edges():
+            self._free_edges(label)
+            self._offsets[label] = self._new_edges(label, new_polygon.num_edges())
+        self._polygons[label] = new_polygon
+        if not gluing_list is None:
+            if not isinstance(gluing_list,list):
+                raise ValueError("gluing_list must be None or a list.")
+            for e in xrange(new_polygon.num_edges()):
+                pair = gluing_list[e]
+                if pair is None:
+                    self._unglue(self._offsets[label]+e)
+                else:
+                    self._change_edge_gluing(label, e, pair[0], pair[1])
+
+    def _change_edge_gluing(self, label1, edge1, label2, edge2):
+        r"""
+        Internal method used by change_edge_gluing(). Should not be called directly.
+        """
+        g1 = self._offsets[label1]+edge1
+        g2 = self._offsets[label2]+edge2
+        self._gluings[g1] = g2
+        self._gluings[g2] = g1
+
+    def _add_polygon(self, new_polygon, gluing_list=None):
+        r"""
+        Internal method used by add_polygon(). Should not be called directly.
+        """
+        new_label = len(self._polygons)
+        self._polygons.append(None)
+        self._offsets.append(-1)
+        if new_polygon is None:
+            # Here we just return a new label and make room for the coming data.
+            return new_label
+        if not gluing_list is None:
+            if not isinstance(gluing_list,list):
+                raise ValueError("gluing_list must be None or a list.")
+            if len(gluing_list) != new_polygon.num_edges():
+                raise ValueError("gluing list must have the same length as the number of edges of new_polygon")
+        self._change_polygon(new_label, new_polygon, gluing_list)
+        return new_label
+
+    def _remove_polygon(self, label):
+        r"""
+        Internal method used by remove_polygon(). Should not be called directly.
+        """
+        self._free_edges(label)
+        self._polygons[label] = None
+        self._num_polygons -= 1
+        if label == len(self._polygons)-1:
+            self._polygons.pop()
+            self._offsets.pop()
+
+    def _change_base_label(self, new_base_label):
+        r"""
+        Internal method for change_base_label. Should not be called directly.
+        """
+        self._base_label = new_base_label
+
 class Surface_polygons_and_gluings(Surface):
     r"""
     Similarity surface build from a list of polygons and gluings.
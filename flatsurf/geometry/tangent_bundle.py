@@ -229,13 +229,96 @@ class SimilaritySurfaceTangentVector:
             -self.vector())
         return new_vector
 
-    def straight_line_trajectory(self):
+    def straight_line_trajectory(self, floating=False):
         r"""
         Return the straight line trajectory associated to this vector.
+
+        If ``floating`` is ``True`` (only available on finite translation
+        surfaces), the trajectory is computed with floating point numbers and
+        only checked with exact arithmetic near the singularities (see
+        :class:`~flatsurf.geometry.straight_line_trajectory.StraightLineTrajectoryFloat`).
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: t = translation_surfaces.square_torus()
+            sage: v = t.tangent_vector(0, (1/5,1/7), (13,17))
+            sage: v.straight_line_trajectory(floating=True)
+            Straight line trajectory made of 1 segments from (54/595, 0) in polygon 0 to (509/595, 1) in polygon 0
         """
+        if floating:
+            from flatsurf.geometry.translation_surface import TranslationSurface
+            if not isinstance(self.surface(), TranslationSurface) or not self.surface().is_finite():
+                raise ValueError("floating point trajectories are only available on finite translation surfaces")
+            from flatsurf.geometry.straight_line_trajectory import StraightLineTrajectoryFloat
+            return StraightLineTrajectoryFloat(self)
         from flatsurf.geometry.straight_line_trajectory import StraightLineTrajectory
         return StraightLineTrajectory(self)
 
+    def straight_line_segment_iterator(self, steps=None, callbacks=()):
+        r"""
+        Iterate over the segments of the forward straight-line trajectory
+        associated to this vector.
+
+        Contrarily to :meth:`straight_line_trajectory`, the segments are
+        produced one at a time and not stored, so that very long trajectories
+        can be followed in constant memory.
+
+        INPUT:
+
+        - ``steps`` -- an optional maximal number of segments
+
+        - ``callbacks`` -- a list of callables which are called on each segment
+          (see :class:`~flatsurf.geometry.straight_line_trajectory.VisitCounter`,
+          :class:`~flatsurf.geometry.straight_line_trajectory.CodingRecorder`
+          and :class:`~flatsurf.geometry.straight_line_trajectory.ClosureDetector`)
+
+        The iteration stops when a singularity is reached or when the
+        trajectory closes up.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: from flatsurf.geometry.straight_line_trajectory import CodingRecorder, ClosureDetector
+            sage: t = translation_surfaces.square_torus()
+            sage: v = t.tangent_vector(0, (1/5,1/7), (1,1))
+            sage: closure = ClosureDetector()
+            sage: coding = CodingRecorder({(0,0): 'a', (0,1): 'b', (0,2):'a', (0,3): 'b'})
+            sage: for seg in v.straight_line_segment_iterator(100, [closure, coding]):
+            ....:     print(seg)
+            Segment in polygon 0 starting at (2/35, 0) and ending at (1, 33/35)
+            Segment in polygon 0 starting at (0, 33/35) and ending at (2/35, 1)
+            sage: closure.closed
+            True
+            sage: coding.coding
+            ['b', 'a']
+        """
+        from flatsurf.geometry.straight_line_trajectory import segment_iterator
+        return segment_iterator(self, steps, callbacks)
+
+    def straight_line_crossing_iterator(self, steps=None, callbacks=()):
+        r"""
+        Iterate over the triples ``(label, edge, point)`` where the forward
+        straight-line trajectory associated to this vector leaves the polygon
+        ``label`` through the edge ``edge`` at ``point``.
+
+        See :meth:`straight_line_segment_iterator` for the meaning of the
+        arguments.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: t = translation_surfaces.square_torus()
+            sage: v = t.tangent_vector(0, (1/5,1/7), (1,1))
+            sage: list(v.straight_line_crossing_iterator())
+            [(0, 1, (1, 33/35)), (0, 2, (2/35, 1))]
+        """
+        for seg in self.straight_line_segment_iterator(steps, callbacks):
+            end = seg.end()
+            pos = end.position()
+            if pos.is_in_edge_interior():
+                yield (seg.polygon_label(), pos.get_edge(), end.point())
+
 class SimilaritySurfaceTangentBundle:
     r"""
     Construct the tangent bundle of a given similarity surface.
@@ -8,6 +8,42 @@ from flatsurf.geometry.half_translation_surface import HalfTranslationSurface
 from flatsurf.geometry.dilation_surface import DilationSurface
 
 from sage.matrix.constructor import matrix, identity_matrix
+from sage.modules.free_module_element import vector
+from sage.rings.integer_ring import ZZ
+from sage.rings.rational_field import QQ
+
+from collections import OrderedDict
+
+def normalized_direction(direction):
+    r"""
+    Return a canonical representative of the positive multiples of ``direction``.
+
+    A rational direction is made a primitive integral vector, any other
+    direction is divided by the absolute value of its first non-zero
+    coordinate.
+
+    EXAMPLES::
+
+        sage: from flatsurf.geometry.translation_surface import normalized_direction
+        sage: normalized_direction((2,4))
+        (1, 2)
+        sage: normalized_direction((-1/3,1/2))
+        (-2, 3)
+        sage: x = polygen(QQ)
+        sage: K.<sqrt2> = NumberField(x^2 - 2, embedding=AA(2).sqrt())
+        sage: normalized_direction((-2,2*sqrt2))
+        (-1, sqrt2)
+    """
+    direction = vector(direction)
+    if direction.is_zero():
+        raise ValueError("the direction must be non-zero")
+    if all(x in QQ for x in direction):
+        direction = direction.change_ring(QQ)
+        direction *= direction.denominator()
+        g = ZZ(direction[0]).gcd(ZZ(direction[1]))
+        return (direction / g).change_ring(ZZ)
+    x = next(x for x in direction if not x.is_zero())
+    return direction / abs(x)
 
 class TranslationSurface(HalfTranslationSurface, DilationSurface):
     r"""
@@ -44,6 +80,179 @@ class TranslationSurface(HalfTranslationSurface, DilationSurface):
             raise ValueError
         return identity_matrix(self.base_ring(),2)
 
+    # number of directions whose flow data is kept in the cache
+    _flow_cache_size = 16
+
+    def _flow_data(self, direction):
+        r"""
+        Return the dictionary of the cached data of the flow in ``direction``.
+
+        It contains the normalized direction (see
+        :func:`normalized_direction`) under the key ``"direction"`` and the
+        flow maps of the polygons that were already computed, indexed by
+        label, under the key ``"flow_maps"``. Proportional directions share the
+        same data. Only the data of the ``_flow_cache_size`` most recently
+        used directions is kept.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: t = translation_surfaces.square_torus()
+            sage: d = t._flow_data((2,4))
+            sage: d["direction"]
+            (1, 2)
+            sage: t._flow_data((1/3,2/3)) is d
+            True
+            sage: t._flow_data((-1,-2)) is d
+            False
+        """
+        direction = normalized_direction(direction)
+        key = tuple(direction)
+        cache = self._s._cache
+        try:
+            lru = cache["flow"]
+        except KeyError:
+            lru = cache["flow"] = OrderedDict()
+        try:
+            data = lru.pop(key)
+        except KeyError:
+            data = {"direction": direction, "flow_maps": {}}
+            while len(lru) >= self._flow_cache_size:
+                lru.popitem(last=False)
+        lru[key] = data
+        return data
+
+    def flow_iet(self, direction):
+        r"""
+        Return the interval exchange transformation induced by the
+        straight-line flow in the given direction.
+
+        The direction is normalized (see :func:`normalized_direction`) and the
+        result is cached (until the surface is mutated) so that all the
+        trajectories in proportional directions share it. Only a few recently
+        used directions are kept in the cache.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: O = translation_surfaces.regular_octagon()
+            sage: T = O.flow_iet((33,45))
+            sage: T
+            Interval exchange transformation of the flow in direction (11, 15)
+            sage: O.flow_iet((33,45)) is T
+            True
+            sage: O.flow_iet((11,15)) is T
+            True
+            sage: T.length() == sum(T.lengths())
+            True
+            sage: sorted(T.permutation()) == range(T.num_intervals())
+            True
+        """
+        from flatsurf.geometry.interval_exchange_transformation import FlowIET
+        data = self._flow_data(direction)
+        try:
+            return data["iet"]
+        except KeyError:
+            pass
+        T = data["iet"] = FlowIET(self, data["direction"], data["flow_maps"])
+        return T
+
+    def flow_many(self, direction, points, steps, alphabet=None):
+        r"""
+        Flow many points in the same direction.
+
+        INPUT:
+
+        - ``direction`` -- the direction of the flow
+
+        - ``points`` -- a list of pairs ``(label, point)``
+
+        - ``steps`` -- the number of edge crossings
+
+        - ``alphabet`` -- an optional dictionary ``(label, edge) -> letter``
+
+        The flow maps of the polygons are computed once and shared by all
+        points (see
+        :meth:`~flatsurf.geometry.interval_exchange_transformation.FlowIET.flow_many`
+        for the output).
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: t = translation_surfaces.square_torus()
+            sage: ends, codings = t.flow_many((1,2), [(0, (1/2,1/2)), (0, (1/4,3/4))], 3)
+            sage: ends
+            [(0, 0, 1/2), (0, 3, 3/4)]
+            sage: codings
+            [[(0, 2), (0, 1), (0, 2)], [(0, 2), (0, 2), (0, 1)]]
+        """
+        T = self.flow_iet(direction)
+        return T.flow_many([T.edge_coordinates(lab, p) for lab,p in points], steps, alphabet)
+
+    def is_completely_periodic(self, direction, max_steps=1000):
+        r"""
+        Return whether the straight-line flow in ``direction`` is completely
+        periodic, that is whether the surface decomposes into cylinders in
+        this direction.
+
+        This runs the Rauzy-Zorich induction of :meth:`flow_iet` for at most
+        ``max_steps`` steps. If the induction did not terminate, ``False`` is
+        returned: the direction is then either not completely periodic or it
+        needs more steps.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: O = translation_surfaces.regular_octagon()
+            sage: O.is_completely_periodic((1,0))
+            True
+            sage: O.is_completely_periodic((1,1))
+            True
+
+        The flow in a direction of irrational slope on the torus is minimal::
+
+            sage: x = polygen(QQ)
+            sage: K.<sqrt2> = NumberField(x^2 - 2, embedding=AA(2).sqrt())
+            sage: t = translation_surfaces.square_torus()
+            sage: t.is_completely_periodic((1,sqrt2))
+            False
+        """
+        return self.flow_iet(direction).rauzy_induction().run(max_steps)
+
+    def cylinder_decomposition(self, direction, max_steps=1000):
+        r"""
+        Return the list of cylinders in the completely periodic ``direction``.
+
+        A ``ValueError`` is raised if :meth:`is_completely_periodic` does not
+        succeed in ``max_steps`` steps. See
+        :class:`~flatsurf.geometry.cylinder.Cylinder` for the data attached
+        to each cylinder.
+
+        EXAMPLES::
+
+            sage: from flatsurf import *
+            sage: O = translation_surfaces.regular_octagon()
+            sage: cylinders = O.cylinder_decomposition((1,0))
+            sage: len(cylinders)
+            2
+            sage: cylinders[0].modulus() == cylinders[1].modulus()
+            True
+            sage: sum(len(C.left_boundary()) for C in cylinders)
+            3
+
+            sage: x = polygen(QQ)
+            sage: K.<sqrt2> = NumberField(x^2 - 2, embedding=AA(2).sqrt())
+            sage: t = translation_surfaces.square_torus()
+            sage: t.cylinder_decomposition((1,sqrt2))
+            Traceback (most recent call last):
+            ...
+            ValueError: the direction (1, sqrt2) is not completely periodic (or needs more than 1000 steps of induction)
+        """
+        if not self.is_completely_periodic(direction, max_steps):
+            raise ValueError("the direction {} is not completely periodic (or needs more than {} steps of induction)".format(tuple(direction), max_steps))
+        from flatsurf.geometry.cylinder import cylinder_decomposition
+        return cylinder_decomposition(self.flow_iet(direction))
+
     def stratum(self):
         r"""
         EXAMPLES::